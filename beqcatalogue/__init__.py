@@ -1,23 +1,50 @@
+import argparse
+import cProfile
 import csv
-import hashlib
+import io
 import json
 import math
+import multiprocessing
 import os
 import re
+import sys
 import time
 import traceback
-import xml.etree.ElementTree as ET
-from collections import defaultdict
-from email.utils import formatdate
-from itertools import groupby
+from collections import Counter, defaultdict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import groupby, repeat
 from operator import itemgetter
+from typing import Iterator
 from urllib import parse
 
+from jinja2 import Environment, FileSystemLoader
 from markdown.extensions.toc import slugify
 
-from iir import xml_to_filt
-
-TWO_WEEKS_AGO = time.time() - (2 * 7 * 24 * 60 * 60)
+from cache import CACHE_DIR, ExtractCache
+from changelog import Changelog, write_feeds
+from columnar import CatalogueExport
+from digests import DigestManifest, fast_digest
+from iir import coefficient_cache, xml_to_filt
+from instrument import BuildReport
+from jsonwriter import JsonArrayWriter
+from minidsp import read_minidsp
+from offsets import IndexedCsvWriter, OffsetIndex, read_runs
+from pages import PageWriter
+from repos import REPO_CONFIGS, RETAINED_AUTHORS
+from response import ResponseCache
+from searchindex import SearchIndex
+from shards import ShardWriter
+from sources import GitObjectSource, InputFile, WorkingTreeSource, open_source
+from spill import TitleGroups
+from sqlitedb import SqliteCatalogue
+from timestore import TimesStore
+
+# files extracted at a time, large enough to keep the worker processes busy
+EXTRACT_BATCH_SIZE = 1024
+
+TEMPLATES = Environment(loader=FileSystemLoader(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')),
+                        keep_trailing_newline=True, autoescape=False)
 
 
 def cleanse_audio_types(audio_types: list[str]) -> list[str]:
@@ -63,7 +90,9 @@ def parse_audio_format(format_string: str) -> tuple[str, str]:
     return (format_string, "")
 
 
-def extract_from_repo(path1: str, path2: str, content_type: str, author: str):
+def extract_from_repo(path1: str, path2: str, content_type: str, author: str, cache: ExtractCache = None,
+                      executor: Executor = None, source: WorkingTreeSource | GitObjectSource = None,
+                      files: list[InputFile] = None) -> Iterator[dict]:
     '''
     extracts beq_metadata of following format
            <beq_metadata>
@@ -103,75 +132,132 @@ def extract_from_repo(path1: str, path2: str, content_type: str, author: str):
                    <episodes count="8">1,2,3,4,5,6,7,8</episodes>
                </beq_season>
 
-    :return:
+    files are read from the working tree beneath path1 unless another source is supplied, and are listed from the
+    source unless the caller has already listed them. If a cache is supplied,
+    files whose blob is unchanged since the last run are not parsed again, nor read at all if the source knows the blob
+    sha up front. If an executor is supplied, the remaining files are extracted in parallel. Files are extracted in
+    batches so only one batch of results is held in memory at a time.
+
+    :return: the meta of each file which was extracted successfully, in file order.
     '''
-    import glob
-    elements = []
-    for xml in sorted(glob.glob(f"{path1}{path2}/**/*.xml", recursive=True)):
-        git_path = str(xml)[len(path1):]
-        try:
-            root = extract_root(xml)
-            file_name = xml[:-4]
-            meta = {
-                'repo_file': str(xml),
-                'git_path': git_path,
-                'file_name': file_name.split('/')[-1],
-                'file_path': '/'.join(file_name[len(path1):].split('/')[:-1]),
-                'content_type': content_type
-            }
-            for child in root:
-                if child.tag == 'beq_metadata':
-                    for m in child:
-                        if len(m) == 0:
-                            txt = m.text
-                            if txt:
-                                if m.tag == 'beq_collection':
-                                    if 'id' in m.attrib:
-                                        meta[m.tag[4:]] = {'id': m.attrib['id'], 'name': m.text}
-                                else:
-                                    meta[m.tag[4:]] = m.text
-                        elif m.tag == 'beq_audioTypes':
-                            audio_types = [c.text.strip() for c in m if c.text]
-                            meta['audioType'] = [at for at in audio_types if at]
-                        elif m.tag == 'beq_season':
-                            parse_season(m, meta, xml)
-                        elif m.tag == 'beq_genres':
-                            genres = [c.text.strip() for c in m if c.text]
-                            meta['genres'] = [at for at in genres if at]
-            filts = [f for f in xml_to_filt(xml, unroll=True)]
-            meta['jsonfilters'] = [f.to_map() for f in filts]
-            meta['filters'] = '^'.join([str(f) for f in filts])
-            title = meta['title']
-            if title[0] == '"':
-                title = title[1:]
-            if title[-1] == '"':
-                title = title[:-1]
-            meta['title'] = title
-            suffix = get_title_suffix(meta)
-            page_title = f"{meta['title']}_{suffix}" if suffix else meta['title']
-            meta['page_title'] = page_title.casefold()
-            if 'gain' in meta:
-                g = meta['gain']
-                if g[0] == '+':
-                    g = g[1:]
-                if g.endswith(' gain'):
-                    g = g[:-5]
-                meta['gain'] = g
-            if 'theMovieDB' in meta:
-                db_id = meta['theMovieDB']
-                try:
-                    int(db_id)
-                except ValueError as e:
-                    print(f"Non integer theMovieDB '{db_id}' found in {xml}")
-                    if db_id[-1] == '"':
-                        meta['theMovieDB'] = db_id[:-1]
-            elements.append(meta)
-        except Exception as e:
-            print(f"Unexpected error while extracting metadata from {xml}")
-            traceback.print_exc()
-            error_files[author].append(f'{git_path}|{e}')
+    if source is None:
+        source = WorkingTreeSource(path1)
+    if files is None:
+        files = source.list_files(path2)
+    count = 0
+    for batch_start in range(0, len(files), EXTRACT_BATCH_SIZE):
+        batch = files[batch_start:batch_start + EXTRACT_BATCH_SIZE]
+        results = {}
+        cache_keys = {}
+        if cache is not None:
+            for f in batch:
+                xml = f"{path1}{f.git_path}"
+                cache_keys[xml], meta = cache.get(f.git_path, xml, sha=f.sha)
+                if meta is not None:
+                    results[xml] = (meta, None, (0, 0, None))
+        to_extract = [f for f in batch if f"{path1}{f.git_path}" not in results]
+        xmls = [f"{path1}{f.git_path}" for f in to_extract]
+        data = [source.read(f) for f in to_extract]
+        extracted_files = set(xmls)
+        if executor is None:
+            extracted = map(extract_file, xmls, repeat(path1), repeat(content_type), data)
+        else:
+            extracted = executor.map(extract_file, xmls, repeat(path1), repeat(content_type), data, chunksize=16)
+        results.update(zip(xmls, extracted))
+        del data
+        for f in batch:
+            git_path = f.git_path
+            xml = f"{path1}{git_path}"
+            meta, error, (coeff_hits, coeff_misses, elapsed) = results.pop(xml)
+            coefficient_stats.update(hits=coeff_hits, misses=coeff_misses)
+            if elapsed is not None:
+                build_report.add_latency(f"{author}/{content_type}", elapsed)
+            if error is None:
+                if cache is not None and xml in extracted_files:
+                    cache.put(git_path, cache_keys[xml], meta)
+                if cache is not None:
+                    meta['blob_sha'] = cache_keys[xml]['sha']
+                count += 1
+                yield meta
+            else:
+                print(f"Unexpected error while extracting metadata from {xml}")
+                print(error[1], end='', file=sys.stderr)
+                error_files[author].append(f'{git_path}|{error[0]}')
+    print(f"Extracted {count} {author} {content_type} catalogue entries")
 
-    return elements
+
+def extract_file(xml: str, path1: str, content_type: str,
+                 data: bytes = None) -> tuple[dict | None, tuple[str, str] | None, tuple[int, int, float]]:
+    '''
+    extracts the meta from a single file, may run in a worker process so only plain picklable values are returned.
+    :param data: the content of the file if it has already been read, e.g. from the git object store.
+    :return: the meta or, if extraction failed, the error message and formatted traceback, along with the
+    coefficient cache hits and misses incurred by this file and the time taken to extract it.
+    '''
+    start = time.perf_counter()
+    git_path = xml[len(path1):]
+    hits, misses = coefficient_cache.hits, coefficient_cache.misses
+    try:
+        minidsp = read_minidsp(xml if data is None else io.BytesIO(data))
+        file_name = xml[:-4]
+        meta = {
+            'repo_file': str(xml),
+            'git_path': git_path,
+            'file_name': file_name.split('/')[-1],
+            'file_path': '/'.join(file_name[len(path1):].split('/')[:-1]),
+            'content_type': content_type
+        }
+        for child in minidsp.metadata:
+            for m in child:
+                if len(m) == 0:
+                    txt = m.text
+                    if txt:
+                        if m.tag == 'beq_collection':
+                            if 'id' in m.attrib:
+                                meta[m.tag[4:]] = {'id': m.attrib['id'], 'name': m.text}
+                        else:
+                            meta[m.tag[4:]] = m.text
+                elif m.tag == 'beq_audioTypes':
+                    audio_types = [c.text.strip() for c in m if c.text]
+                    meta['audioType'] = [at for at in audio_types if at]
+                elif m.tag == 'beq_season':
+                    parse_season(m, meta, xml)
+                elif m.tag == 'beq_genres':
+                    genres = [c.text.strip() for c in m if c.text]
+                    meta['genres'] = [at for at in genres if at]
+        filts = [f for f in xml_to_filt(xml, unroll=True, root=minidsp.filters)]
+        meta['jsonfilters'] = [f.to_map() for f in filts]
+        meta['filters'] = '^'.join([str(f) for f in filts])
+        title = meta['title']
+        if title[0] == '"':
+            title = title[1:]
+        if title[-1] == '"':
+            title = title[:-1]
+        meta['title'] = title
+        suffix = get_title_suffix(meta)
+        page_title = f"{meta['title']}_{suffix}" if suffix else meta['title']
+        meta['page_title'] = page_title.casefold()
+        if 'gain' in meta:
+            g = meta['gain']
+            if g[0] == '+':
+                g = g[1:]
+            if g.endswith(' gain'):
+                g = g[:-5]
+            meta['gain'] = g
+        if 'theMovieDB' in meta:
+            db_id = meta['theMovieDB']
+            try:
+                int(db_id)
+            except ValueError as e:
+                print(f"Non integer theMovieDB '{db_id}' found in {xml}")
+                if db_id[-1] == '"':
+                    meta['theMovieDB'] = db_id[:-1]
+        error = None
+    except Exception as e:
+        meta = None
+        error = (str(e), traceback.format_exc())
+    return meta, error, (coefficient_cache.hits - hits, coefficient_cache.misses - misses,
+                         time.perf_counter() - start)
 
 
 def get_title_suffix(meta):
@@ -181,13 +267,6 @@ def get_title_suffix(meta):
     return suffix
 
 
-def extract_root(xml):
-    import xml.etree.ElementTree as ET
-    et_tree = ET.parse(str(xml))
-    root = et_tree.getroot()
-    return root
-
-
 def parse_season(m, meta, xml):
     try:
         meta['season'] = {
@@ -213,8 +292,9 @@ def parse_season(m, meta, xml):
         print(f"Unable to parse season info from {xml}")
 
 
-def group_film_content(author, content_meta):
-    by_title = defaultdict(list)
+def group_film_content(author, content_meta) -> TitleGroups:
+    by_title = TitleGroups()
+    first_page_titles = {}
     fallback_pattern = re.compile(r'(.*) \((\d{4})\)(?: *\(.*\))? (.*)')
     for meta in content_meta:
         try:
@@ -222,12 +302,14 @@ def group_film_content(author, content_meta):
                 title = meta['title']
                 page_title = meta['page_title']
                 if title.casefold() in by_title:
-                    if page_title == by_title[title.casefold()][0]['page_title']:
-                        by_title[title.casefold()].append(meta)
+                    if page_title == first_page_titles[title.casefold()]:
+                        key = title.casefold()
                     else:
-                        by_title[page_title.casefold()].append(meta)
+                        key = page_title.casefold()
                 else:
-                    by_title[title.casefold()].append(meta)
+                    key = title.casefold()
+                by_title.append(key, meta)
+                first_page_titles.setdefault(key, page_title)
             else:
                 entry = {
                     'title': meta['file_name'],
@@ -242,35 +324,66 @@ def group_film_content(author, content_meta):
                 entry['page_title'] = entry['title'].casefold()
                 print(f"Missing title entry, extracted {entry}")
                 entry['filters'] = meta['jsonfilters']
-                add_to_catalogue(entry, meta['git_path'], author)
+                add_to_catalogue(entry, meta, author)
         except Exception as e:
             print(f'Unexpected error when grouping {meta["git_path"]}')
-            error_files[author].append(f'{meta["git_path"]}|{e}')
+            grouping_errors[author].append(f'{meta["git_path"]}|{e}')
             traceback.print_exc()
     return by_title
 
 
-def add_to_catalogue(entry: dict, path: str, author: str):
-    entry['digest'] = digest(entry)
-    t = times.get(author, [])
-    if path in t:
-        entry['created_at'] = t[path][0]
-        entry['updated_at'] = t[path][1]
+def add_to_catalogue(entry: dict, meta: dict, author: str):
+    manifest = digest_manifests.get(author, None)
+    if manifest is not None:
+        entry['digest'] = manifest.digest(entry, meta['git_path'], meta.get('blob_sha', None), meta['filters'])
+    else:
+        entry['digest'] = fast_digest(entry, meta['filters'])
+    path = meta['git_path']
+    t = times[author].get(path) if author in times else None
+    if t is not None:
+        entry['created_at'] = t[0]
+        entry['updated_at'] = t[1]
     else:
         print(f"Missing times for {author} / {path}")
         entry['created_at'] = 0
         entry['updated_at'] = 0
-    json_catalogue.append(entry)
+    write_to_catalogue(entry, path)
 
 
-def digest(entry: dict) -> str:
-    digest_keys = ['title', 'filters', 'mv', 'season', 'episode']
-    to_hash = json.dumps(slice_dict(digest_keys, entry)).encode('utf-8')
-    return hashlib.sha256(to_hash).hexdigest()
+# the keys needed after the catalogue has been written to detect duplicates
+DUPLICATE_KEYS = ['title', 'author', 'underlying']
 
 
-def group_tv_content(author, content_meta):
-    by_title = {}
+def write_to_catalogue(entry: dict, git_path: str = None, carried: bool = False):
+    '''
+    normalises the audio types then streams the entry to the catalogue outputs, only what is needed to detect
+    duplicates, report audio types and work out what changed since the previous build is kept in memory.
+    :param git_path: the file the entry was extracted from, unknown for retained entries.
+    :param carried: the entry is carried forward from the previous build, its SQLite row is already kept.
+    '''
+    audio_types = cleanse_audio_types(entry['audioTypes'])
+    entry['audioTypes'] = audio_types
+    if audio_types:
+        codec_channels = [parse_audio_format(at) for at in audio_types]
+        entry['audioCodecs'] = [a[0] for a in codec_channels]
+        entry['audioChannelCounts'] = [a[1] for a in codec_channels]
+    entry.pop('audioCodec', None)
+    encoded = db_json_writer.encode(entry)
+    db_json_index.add(entry['author'], *db_json_writer.write(entry, encoded))
+    responses.add(entry['digest'], entry['filters'])
+    if catalogue_db and not carried:
+        catalogue_db.add(entry, git_path)
+    if columnar_export:
+        columnar_export.add(entry)
+    search_index.add(entry)
+    shard_writer.add(entry, encoded)
+    catalogue_digests[entry['digest']].append(slice_dict(DUPLICATE_KEYS, entry))
+    catalogue_audio_types.update(entry['audioTypes'])
+    changelog.add(entry)
+
+
+def group_tv_content(author, content_meta) -> TitleGroups:
+    by_title = TitleGroups()
     fallback_pattern = re.compile(r'(.*) \((\d{4})\)(?: *\(.*\))? (.*)')
     for meta in content_meta:
         try:
@@ -300,10 +413,7 @@ def group_tv_content(author, content_meta):
                     else:
                         del meta['note']
                         print(f"Note used for episode info by {meta['repo_file']}, removing note from meta")
-                if title in by_title:
-                    by_title[title].append(meta)
-                else:
-                    by_title[title] = [meta]
+                by_title.append(title, meta)
             else:
                 entry = {
                     'title': meta['file_name'],
@@ -317,50 +427,65 @@ def group_tv_content(author, content_meta):
                     entry['audioTypes'] = match.group(3).split('+')
                 print(f"Missing title entry, extracted {entry}")
                 entry['filters'] = meta['jsonfilters']
-                add_to_catalogue(entry, meta['git_path'], author)
+                add_to_catalogue(entry, meta, author)
         except Exception as e:
             print(f'Unexpected error when grouping {meta["git_path"]}')
-            error_files[author].append(f'{meta["git_path"]}|{e}')
+            grouping_errors[author].append(f'{meta["git_path"]}|{e}')
             traceback.print_exc()
     return by_title
 
 
-def process_content_from_repo(author: str, content_meta, index_entries, content_type, pages_touched, created_titles=None):
-    ''' converts beq_metadata into md '''
+def process_content_from_repo(author: str, content_meta, index_entries, content_type, pages_touched,
+                              page_writer: PageWriter, created_titles=None):
+    ''' converts beq_metadata into md, content_meta may be a generator which is consumed as the content is grouped '''
     page_titles = []
-    if content_type == 'film':
-        by_title = group_film_content(author, content_meta)
-    else:
-        by_title = group_tv_content(author, content_meta)
-    for title, metas in by_title.items():
-        title_md = slugify(title, '-')
-        if created_titles and title_md in created_titles:
-            title_md = f'{title_md}-{content_type}'
-        page_titles.append(title_md)
-        from pathlib import Path
-        Path(f"docs/{author}").mkdir(parents=True, exist_ok=True)
-        page = f"docs/{author}/{title_md}.md"
-        pages_touched.append(page)
-        with open(page, mode='w+') as content_md:
-            generate_content_page(title_md, metas, content_md, index_entries, author, content_type)
+    with build_report.stage('extract', author=author, content_type=content_type):
+        if content_type == 'film':
+            by_title = group_film_content(author, content_meta)
+        else:
+            by_title = group_tv_content(author, content_meta)
+    with by_title:
+        for title, metas in by_title.items():
+            write_content_page(author, title, metas, index_entries, content_type, pages_touched, page_writer,
+                               created_titles, page_titles)
     return page_titles
 
 
-def generate_content_page(page_name, metas, content_md, index_entries, author, content_type):
+def write_content_page(author: str, title: str, metas: list[dict], index_entries, content_type, pages_touched,
+                       page_writer: PageWriter, created_titles, page_titles):
+    title_md = slugify(title, '-')
+    if created_titles and title_md in created_titles:
+        title_md = f'{title_md}-{content_type}'
+    page_titles.append(title_md)
+    from pathlib import Path
+    Path(f"docs/{author}").mkdir(parents=True, exist_ok=True)
+    page = f"docs/{author}/{title_md}.md"
+    pages_touched.append(page)
+    md_lines = []
+    generate_content_page(title_md, metas, md_lines, index_entries, author, content_type)
+    page_writer.write(page, render_lines(md_lines))
+
+
+def render_lines(md_lines: list[str]) -> str:
+    ''' joins the lines of a page into the same content as printing each line in turn '''
+    return '\n'.join(md_lines) + '\n' if md_lines else ''
+
+
+def generate_content_page(page_name, metas, md_lines, index_entries, author, content_type):
     try:
         if content_type == 'film':
-            generate_film_content_page(page_name, metas, content_md, index_entries, author)
+            generate_film_content_page(page_name, metas, md_lines, index_entries, author)
         else:
-            generate_tv_content_page(page_name, metas, content_md, index_entries, author)
+            generate_tv_content_page(page_name, metas, md_lines, index_entries, author)
     except Exception as e:
         print(f"Unexpected error while processing {content_type} content file {author} -- {metas[0]['git_path']}")
         raise e
 
 
-def generate_film_content_page(page_name, metas, content_md, index_entries, author):
-    ''' prints the md content page '''
-    print(f"# {metas[0]['title']}", file=content_md)
-    print("", file=content_md)
+def generate_film_content_page(page_name, metas, md_lines, index_entries, author):
+    ''' appends each line of the md content page to md_lines '''
+    md_lines.append(f"# {metas[0]['title']}")
+    md_lines.append("")
     img_idx = 0
     for meta in sorted(metas, key=lambda m: ', '.join(m.get('audioType', ''))):
         if 'pvaURL' not in meta and 'spectrumURL' not in meta:
@@ -375,13 +500,13 @@ def generate_film_content_page(page_name, metas, content_md, index_entries, auth
                 actual_img_links.append(meta['spectrumURL'])
             if audio_type:
                 linked_content_format = ', '.join(audio_type)
-                print(f"## {linked_content_format}", file=content_md)
+                md_lines.append(f"## {linked_content_format}")
                 if 'edition' in meta:
-                    print("", file=content_md)
-                    print(meta['edition'], file=content_md)
+                    md_lines.append("")
+                    md_lines.append(meta['edition'])
                 if 'altTitle' in meta and meta['altTitle'] != meta['title']:
-                    print("", file=content_md)
-                    print(meta['altTitle'], file=content_md)
+                    md_lines.append("")
+                    md_lines.append(meta['altTitle'])
                 extra_meta = []
                 if 'year' in meta:
                     extra_meta.append(meta['year'])
@@ -396,25 +521,24 @@ def generate_film_content_page(page_name, metas, content_md, index_entries, auth
                     if g:
                         extra_meta.append(g)
                 extra_meta.append(author)
-                print('', file=content_md)
+                md_lines.append('')
                 e = ' \u2022 '.join(extra_meta)
-                print(f"**{e}**", file=content_md)
+                md_lines.append(f"**{e}**")
                 if 'overview' in meta:
-                    print('', file=content_md)
-                    print(meta['overview'], file=content_md)
-                    print('{ data-search-exclude }', file=content_md)
+                    md_lines.append('')
+                    md_lines.append(meta['overview'])
+                    md_lines.append('{ data-search-exclude }')
                 if 'gain' in meta:
-                    print('', file=content_md)
-                    print(f"**MV Adjustment:** {'+' if float(meta['gain']) > 0 else ''}{meta['gain']} dB",
-                          file=content_md)
+                    md_lines.append('')
+                    md_lines.append(f"**MV Adjustment:** {'+' if float(meta['gain']) > 0 else ''}{meta['gain']} dB")
                 if 'note' in meta:
-                    print('', file=content_md)
-                    print(meta['note'], file=content_md)
-                    print('{ data-search-exclude }', file=content_md)
+                    md_lines.append('')
+                    md_lines.append(meta['note'])
+                    md_lines.append('{ data-search-exclude }')
                 if 'warning' in meta:
-                    print('', file=content_md)
-                    print(f"**{meta['warning']}**", file=content_md)
-                    print('{ data-search-exclude }', file=content_md)
+                    md_lines.append('')
+                    md_lines.append(f"**{meta['warning']}**")
+                    md_lines.append('{ data-search-exclude }')
                 links = []
                 if 'avs' in meta:
                     links.append(f"[Discuss]({meta['avs']})")
@@ -422,14 +546,14 @@ def generate_film_content_page(page_name, metas, content_md, index_entries, auth
                     tmdb_url = make_tmdb_url('film', parse.quote(meta['title']), meta['theMovieDB'])
                     links.append(f"[TMDB]({tmdb_url})")
                 if links:
-                    print('', file=content_md)
-                    print('  '.join(links), file=content_md)
-                    print('{ data-search-exclude }', file=content_md)
+                    md_lines.append('')
+                    md_lines.append('  '.join(links))
+                    md_lines.append('{ data-search-exclude }')
                 if actual_img_links:
-                    print('', file=content_md)
+                    md_lines.append('')
                 for img in actual_img_links:
-                    print(f"![img {img_idx}]({img})", file=content_md)
-                    print('', file=content_md)
+                    md_lines.append(f"![img {img_idx}]({img})")
+                    md_lines.append('')
                     img_idx = img_idx + 1
                 bd_url = generate_index_entry(author, page_name, linked_content_format, meta['title'],
                                               meta.get('year', ''), meta.get('avs', None), meta.get('theMovieDB', None),
@@ -474,7 +598,7 @@ def generate_film_content_page(page_name, metas, content_md, index_entries, auth
                 'altTitle': meta.get('alt_title', ''),
                 'collection': meta.get('collection', {}),
                 'underlying': meta['file_name']
-            }, meta['git_path'], author)
+            }, meta, author)
             generate_shake_eq(meta, author, page_name)
 
 
@@ -522,13 +646,13 @@ def format_season_episode(m) -> tuple[str, str, str, str]:
     return long_season_episode, short_season_episode, season, episodes
 
 
-def generate_tv_content_page(page_name, metas, content_md, index_entries, author):
-    ''' prints the md content page '''
-    print(f"# {metas[0]['title']}", file=content_md)
-    print("", file=content_md)
-    print(f"* Author: {author}", file=content_md)
+def generate_tv_content_page(page_name, metas, md_lines, index_entries, author):
+    ''' appends each line of the md content page to md_lines '''
+    md_lines.append(f"# {metas[0]['title']}")
+    md_lines.append("")
+    md_lines.append(f"* Author: {author}")
     img_idx = 0
-    print("", file=content_md)
+    md_lines.append("")
 
     def sort_meta(m):
         sort_key = ''
@@ -554,35 +678,34 @@ def generate_tv_content_page(page_name, metas, content_md, index_entries, author
         if 'spectrumURL' in meta:
             actual_img_links.append(meta['spectrumURL'])
         if long_season:
-            print(f"## {long_season}", file=content_md)
-            print("", file=content_md)
+            md_lines.append(f"## {long_season}")
+            md_lines.append("")
         if audio_type:
             linked_content_format = ', '.join(audio_type)
-            print(f"* {linked_content_format}", file=content_md)
-            print("", file=content_md)
+            md_lines.append(f"* {linked_content_format}")
+            md_lines.append("")
         if 'gain' in meta:
-            print('', file=content_md)
-            print(f"**MV Adjustment:** {'+' if float(meta['gain']) > 0 else ''}{meta['gain']} dB",
-                  file=content_md)
+            md_lines.append('')
+            md_lines.append(f"**MV Adjustment:** {'+' if float(meta['gain']) > 0 else ''}{meta['gain']} dB")
         if 'note' in meta:
-            print('', file=content_md)
-            print(meta['note'], file=content_md)
-            print('{ data-search-exclude }', file=content_md)
+            md_lines.append('')
+            md_lines.append(meta['note'])
+            md_lines.append('{ data-search-exclude }')
         if 'warning' in meta:
-            print('', file=content_md)
-            print(f"**{meta['warning']}**", file=content_md)
-            print('{ data-search-exclude }', file=content_md)
+            md_lines.append('')
+            md_lines.append(f"**{meta['warning']}**")
+            md_lines.append('{ data-search-exclude }')
         if 'avs' in meta:
-            print('', file=content_md)
-            print(f"* [Forum Post]({meta['avs']})", file=content_md)
+            md_lines.append('')
+            md_lines.append(f"* [Forum Post]({meta['avs']})")
         if 'year' in meta:
-            print('', file=content_md)
-            print(f"* Production Year: {meta['year']}", file=content_md)
-            print("", file=content_md)
+            md_lines.append('')
+            md_lines.append(f"* Production Year: {meta['year']}")
+            md_lines.append("")
         for img in actual_img_links:
-            print('', file=content_md)
-            print(f"![img {img_idx}]({img})", file=content_md)
-            print('', file=content_md)
+            md_lines.append('')
+            md_lines.append(f"![img {img_idx}]({img})")
+            md_lines.append('')
 
         extra_slug = f"#{slugify(long_season, '-')}" if long_season else ''
         bd_url = generate_index_entry(author, page_name, linked_content_format, f"{meta['title']} {short_season}",
@@ -610,8 +733,8 @@ def generate_tv_content_page(page_name, metas, content_md, index_entries, author
             fp = meta['file_path'].replace('TV BEQs', 'TV Series')
             img = f"https://gitlab.com/Mobe1969/beq-reports/-/raw/master/{quote(fp)}/{quote(meta['file_name'])}.jpg"
             actual_img_links = [img]
-            print(f"![img {img_idx}]({img})", file=content_md)
-            print('', file=content_md)
+            md_lines.append(f"![img {img_idx}]({img})")
+            md_lines.append('')
 
         add_to_catalogue({
             'title': meta['title'],
@@ -637,7 +760,7 @@ def generate_tv_content_page(page_name, metas, content_md, index_entries, author
             'rating': meta.get('rating', ''),
             'genres': meta.get('genres', []),
             'underlying': meta['file_name']
-        }, meta['git_path'], author)
+        }, meta, author)
 
 
 def generate_index_entry(author, page_name, content_format, content_name, year, avs_url, tmdb_id, multiformat,
@@ -674,15 +797,9 @@ def slice_dict(keys: list[str], d: dict) -> dict:
 
 
 def detect_duplicate_hashes():
-    hashes = defaultdict(list)
-    slim_keys = ['title', 'author', 'underlying']
-
-    for j in json_catalogue:
-        hashes[j['digest']].append(slice_dict(slim_keys, j))
-
     unique_count = 0
     ignored_authors = ['mobe1969','aron7awol']
-    for k, v in hashes.items():
+    for k, v in catalogue_digests.items():
         if len(v) > 1:
             formatted = set()
             for dupe in v:
@@ -694,40 +811,7 @@ def detect_duplicate_hashes():
     print(f"{unique_count} unique catalogue entries generated")
 
 
-def load_times(author: str) -> dict[str, tuple[int, int]]:
-    times = {}
-    from csv import reader
-    if os.path.isfile(f"meta/{author}.times.csv"):
-        with open(f"meta/{author}.times.csv") as f:
-            for row in reader(f):
-                times[row[0]] = (int(row[1]), int(row[2]))
-    return apply_times_diff(times, author)
-
-
-def apply_times_diff(times: dict[str, tuple[int, int]], author: str) -> dict[str, tuple[int, int]]:
-    from csv import reader
-    if os.path.isfile(f"meta/{author}.diff"):
-        with open(f"meta/{author}.diff") as f:
-            for row in reader(f):
-                if row[0] in times:
-                    old = times[row[0]]
-                    times[row[0]] = (old[0], int(row[1]))
-                else:
-                    times[row[0]] = (int(row[1]), int(row[1]))
-    with open(f"meta/{author}.times.csv", mode="w") as f:
-        from csv import writer
-        w = writer(f)
-        for k, v in times.items():
-            vals = [k, str(v[0]), str(v[1])]
-            w.writerow(vals)
-    return times
-
-
-def dump_audio_types(json_catalogue):
-    audio_types = set()
-    for c in json_catalogue:
-        for at in c.get('audioTypes', []):
-            audio_types.add(at)
+def dump_audio_types(audio_types: set[str]):
     print(f"Found {len(audio_types)} audio types- {sorted(list(audio_types))}")
 
 
@@ -746,159 +830,234 @@ def dump_excess_files(pages_touched: list[str]):
             for p in to_delete:
                 print(f'rm -f {p}')
 
-def retrieve_retained_rows(retained_authors: list[str]) -> list[list[str]]:
-    retained = []
+def retrieve_retained_rows(retained_authors: list[str]) -> Iterator[list[str]]:
     db_path = 'docs/database.csv'
-    if os.path.exists(db_path):
+    runs = read_runs(db_path, retained_authors)
+    if runs is not None:
+        for run in runs:
+            yield from csv.reader(io.StringIO(run.decode('utf-8'), newline=''))
+    elif os.path.exists(db_path):
         with open(db_path, newline='', encoding='utf-8') as f:
             reader = csv.reader(f)
             try:
                 next(reader)
                 for row in reader:
                     if len(row) > 3 and row[3] in retained_authors:
-                        retained.append(row)
+                        yield row
             except StopIteration:
                 pass
-    return retained
 
 
-def retrieve_retained_catalogue(retained_authors: list[str]) -> list[dict]:
-    retained = []
+def retrieve_retained_catalogue(retained_authors: list[str]) -> Iterator[dict]:
     db_path = 'docs/database.json'
-    if os.path.exists(db_path):
+    runs = read_runs(db_path, retained_authors)
+    if runs is not None:
+        for run in runs:
+            yield from json.loads(b'[' + run + b']')
+    elif os.path.exists(db_path):
         try:
             with open(db_path, 'r', encoding='utf-8') as f:
                 data = json.load(f)
-                if isinstance(data, list):
-                    for entry in data:
-                        if isinstance(entry, dict) and entry.get('author', '') in retained_authors:
-                            retained.append(entry)
         except Exception:
             print(f"Failed to load retained entries from {db_path}")
             traceback.print_exc()
-    return retained
+            return
+        if isinstance(data, list):
+            for entry in data:
+                if isinstance(entry, dict) and entry.get('author', '') in retained_authors:
+                    yield entry
+
+
+def carry_forward(author: str) -> int:
+    '''
+    writes the entries of an author from the previous build to every catalogue output, as is done for the retained
+    authors, e.g. as its extraction failed before anything was written.
+    :return: the number of entries carried forward.
+    '''
+    for r in retrieve_retained_rows([author]):
+        db_writer.writerow(r)
+    if catalogue_db:
+        catalogue_db.keep(author)
+    carried_pages: set[str] = set()
+    count = 0
+    for e in retrieve_retained_catalogue([author]):
+        carried_pages.add(retained_page(e))
+        write_to_catalogue(e, carried=True)
+        count += 1
+    pages_touched.extend(carried_pages - set(pages_touched))
+    return count
+
+
+def retained_page(entry: dict) -> str:
+    doc_page = f"docs/{entry['catalogue_url'][46:]}"
+    hash_idx = doc_page.find("/#")
+    if hash_idx > -1:
+        doc_page = doc_page[0:hash_idx]
+    if doc_page[-1] == '/':
+        doc_page = doc_page[0:-1]
+    return f'{doc_page}.md'
 
 
 if __name__ == '__main__':
-    repo_configs = [
-        ('halcyon888', '.input/halcyon888/miniDSPBEQ/', 'Movie BEQs', 'TV Shows BEQ'),
-        ('t1g8rsfan', '.input/t1g8rsfan/miniDSPBEQ/', 'Movie BEQs', 'TV Shows BEQ'),
-        ('kaelaria', '.input/kaelaria/Beq1/', 'movies', 'tv'),
-        ('remixmark', '.input/remixmark/miniDSPBEQ/', 'Movie BEQs', 'TV BEQs'),
-        ('mikejl', '.input/mikejl/xml/', 'Movies', 'TV'),
-        ('bombaycat007', '.input/bombaycat007/miniDSPBEQ/', 'Movie BEQs', 'TV BEQS')
-    ]
-
-    all_authors = [a[0] for a in repo_configs]
-    times = {a: load_times(a) for a in all_authors}
+    arg_parser = argparse.ArgumentParser(description='Generates the beqcatalogue from the author repositories')
+    arg_parser.add_argument('--incremental', action='store_true',
+                            help='only extract files, and rewrite pages, which have changed since the last run')
+    arg_parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='number of processes used to extract from the author repositories, 1 to run serially')
+    arg_parser.add_argument('--git-objects', action='store_true',
+                            help='read the author files committed at HEAD from the git object store rather than the '
+                                 'working tree, the author repositories may then be bare')
+    arg_parser.add_argument('--compact-json', action='store_true',
+                            help='write database.json without whitespace and with sorted keys')
+    arg_parser.add_argument('--gzip-json', action='store_true',
+                            help='also write a gzip compressed copy of database.json to database.json.gz')
+    arg_parser.add_argument('--sqlite', metavar='PATH',
+                            help='also write the catalogue to a SQLite database at PATH, updating it in place if it exists')
+    arg_parser.add_argument('--columnar', metavar='DIR',
+                            help='also export the entries and filters as columnar tables to DIR')
+    arg_parser.add_argument('--profile', action='store_true',
+                            help='profile the build with cProfile and dump the stats to .cache/build.prof, use with '
+                                 '--workers 1 to include extraction')
+    args = arg_parser.parse_args()
+    build_report = BuildReport()
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+
+    all_authors = [a[0] for a in REPO_CONFIGS]
+    times = {a: TimesStore(a) for a in all_authors}
+    for a in all_authors:
+        with build_report.stage('load_times', author=a):
+            times[a].apply_diff()
     error_files = {a: [] for a in all_authors}
-    film_data = {}
-    tv_data = {}
-
-    for author, repo_path, film_sub, tv_sub in repo_configs:
-        try:
-            film_data[author] = extract_from_repo(repo_path, film_sub, 'film', author)
-            print(f"Extracted {len(film_data[author])} {author} film catalogue entries")
-            tv_data[author] = extract_from_repo(repo_path, tv_sub, 'TV', author)
-            print(f"Extracted {len(tv_data[author])} {author} TV catalogue entries")
-        except:
-            print(f"Failed to extract for {author}")
-            traceback.print_exc()
+    failed_authors: set[str] = set()
+    # authors which failed after some of their entries were written, the catalogue cannot be published
+    incomplete_authors: set[str] = set()
+    grouping_errors = {a: [] for a in all_authors}
+    coefficient_stats = Counter()
+    caches = {a: ExtractCache(a) for a in all_authors} if args.incremental else {}
+    digest_manifests = {a: DigestManifest(a) for a in all_authors} if args.incremental else {}
 
-    retained_rows = retrieve_retained_rows(['aron7awol', 'mobe1969'])
-    json_catalogue = retrieve_retained_catalogue(['aron7awol', 'mobe1969'])
     pages_touched: list[str] = []
-    assumed_touched: set[str] = set()
-    for e in json_catalogue:
-        doc_page = f"docs/{e['catalogue_url'][46:]}"
-        hash_idx = doc_page.find("/#")
-        if hash_idx > -1:
-            doc_page = doc_page[0:hash_idx]
-        if doc_page[-1] == '/':
-            doc_page = doc_page[0:-1]
-        assumed_touched.add(f'{doc_page}.md')
-    pages_touched.extend(assumed_touched)
-
-    print(f"Retained {len(retained_rows)} csv entries, {len(json_catalogue)} json entries and {len(pages_touched)} touched pages")
-
-    with open('docs/database.csv', 'w+', newline='') as db_csv:
-        db_writer = csv.writer(db_csv)
+    page_writer = PageWriter()
+    responses = ResponseCache()
+    catalogue_db = SqliteCatalogue(args.sqlite) if args.sqlite else None
+    columnar_export = CatalogueExport(args.columnar) if args.columnar else None
+    search_index = SearchIndex()
+    catalogue_digests = defaultdict(list)
+    catalogue_audio_types = set()
+    changelog = Changelog()
+
+    db_csv_index = OffsetIndex('docs/database.csv')
+    db_json_index = OffsetIndex('docs/database.json')
+    # the extraction workers are started lazily so are spawned rather than forked, a forked worker would inherit the
+    # stdin of any git cat-file process already opened by a GitObjectSource which then never sees it close
+    worker_context = multiprocessing.get_context('spawn')
+    # the retained rows are read back from the previous database.csv while the new one is written
+    with build_report.stage('catalogue'), \
+            open('docs/database.csv.tmp', 'wb') as db_csv, \
+            JsonArrayWriter('docs/database.json', compact=args.compact_json, compress=args.gzip_json) as db_json_writer, \
+            ShardWriter(compact=args.compact_json) as shard_writer, \
+            ProcessPoolExecutor(args.workers, worker_context) if args.workers > 1 else nullcontext() as executor:
+        db_writer = IndexedCsvWriter(db_csv, db_csv_index)
         db_writer.writerow(['Title', 'Year', 'Format', 'Author', 'AVS', 'Catalogue', 'blu-ray.com', 'filters'])
-        for r in retained_rows:
-            db_writer.writerow(r)
-
-        for author in all_authors:
-            index_entries = []
-            page_titles = process_content_from_repo(author, film_data[author], index_entries, 'film', pages_touched)
-            if author in tv_data:
-                process_content_from_repo(author, tv_data[author], index_entries, 'TV', pages_touched, created_titles=page_titles)
-            with open(f'docs/{author}.md', mode='w+') as index_md:
-                print('---', file=index_md)
-                print('search:', file=index_md)
-                print('  exclude: true', file=index_md)
-                print('---', file=index_md)
-                print('', file=index_md)
-                print(f"# {author}", file=index_md)
-                print('', file=index_md)
-                print(f"| Title | Type | Year | Format | Multiformat? | Links |", file=index_md)
-                print(f"|-|-|-|-|-|-|", file=index_md)
-                for i in sorted(index_entries, key=str.casefold):
-                    print(i, file=index_md)
-                print('', file=index_md)
-
-    for entry in json_catalogue:
-        audio_types = cleanse_audio_types(entry['audioTypes'])
-        entry['audioTypes'] = audio_types
-        if audio_types:
-            codec_channels = [parse_audio_format(at) for at in audio_types]
-            entry['audioCodecs'] = [a[0] for a in codec_channels]
-            entry['audioChannelCounts'] = [a[1] for a in codec_channels]
-        entry.pop('audioCodec', None)
-
-
+        with build_report.stage('load_retained'):
+            retained_rows = 0
+            for r in retrieve_retained_rows(RETAINED_AUTHORS):
+                db_writer.writerow(r)
+                retained_rows += 1
+            assumed_touched: set[str] = set()
+            for e in retrieve_retained_catalogue(RETAINED_AUTHORS):
+                assumed_touched.add(retained_page(e))
+                write_to_catalogue(e)
+            pages_touched.extend(assumed_touched)
+        print(f"Retained {retained_rows} csv entries, {db_json_writer.count} json entries and {len(pages_touched)} touched pages")
+
+        for author, repo_path, film_sub, tv_sub in REPO_CONFIGS:
+            with build_report.stage('pages', author=author):
+                index_entries = []
+                cache = caches.get(author, None)
+                written = (db_writer.rows, db_json_writer.count)
+                try:
+                    with open_source(repo_path, args.git_objects) as source:
+                        # a missing or broken repository fails here, before anything is written
+                        film_files = source.list_files(film_sub)
+                        tv_files = source.list_files(tv_sub)
+                        if not film_files and not tv_files:
+                            raise ValueError(f"No files found in {repo_path}")
+                        page_titles = process_content_from_repo(author,
+                                                                extract_from_repo(repo_path, film_sub, 'film', author,
+                                                                                  cache, executor, source,
+                                                                                  film_files),
+                                                                index_entries, 'film', pages_touched, page_writer)
+                        process_content_from_repo(author,
+                                                  extract_from_repo(repo_path, tv_sub, 'TV', author, cache, executor,
+                                                                    source, tv_files),
+                                                  index_entries, 'TV', pages_touched, page_writer,
+                                                  created_titles=page_titles)
+                except Exception:
+                    # any pages generated before the failure are kept, the rest of the author's pages are left alone
+                    print(f"Failed to extract for {author}")
+                    traceback.print_exc()
+                    failed_authors.add(author)
+                    page_writer.keep(f'docs/{author}/')
+                    page_writer.keep(f'docs/{author}.md')
+                    changelog.keep(author)
+                    if written == (db_writer.rows, db_json_writer.count):
+                        print(f"Carried forward {carry_forward(author)} {author} entries from the previous build")
+                    else:
+                        print(f"Some {author} entries were written before the failure, the catalogue is incomplete")
+                        incomplete_authors.add(author)
+                    continue
+                if cache is not None:
+                    cache.save()
+                    digest_manifests[author].save()
+                if index_entries or not os.path.isfile(f'docs/{author}.md'):
+                    index_md = TEMPLATES.get_template('author.md.j2').render(author=author,
+                                                                             entries=sorted(index_entries,
+                                                                                            key=str.casefold))
+                    page_writer.write(f'docs/{author}.md', index_md)
+                else:
+                    print(f"No entries found for {author}, leaving docs/{author}.md alone")
+                    page_writer.keep(f'docs/{author}.md')
+    os.replace('docs/database.csv.tmp', 'docs/database.csv')
+    with build_report.stage('write_outputs'):
+        db_csv_index.save()
+        db_json_index.save()
+        if catalogue_db:
+            catalogue_db.finish()
+        if columnar_export:
+            columnar_export.save()
+        search_index.save(page_writer)
+        with build_report.stage('rss'):
+            write_feeds(changelog.finish(), all_authors + RETAINED_AUTHORS, ['film', 'TV'], page_writer)
+        page_writer.finish()
     detect_duplicate_hashes()
-    dump_audio_types(json_catalogue)
+    print(f"Coefficient cache: {coefficient_stats['hits']} hits, {coefficient_stats['misses']} misses")
+    dump_audio_types(catalogue_audio_types)
     dump_excess_files(pages_touched)
 
     for author, errors in error_files.items():
+        if author in failed_authors:
+            # whatever was found before the failure is incomplete
+            print(f"Leaving the times and errors of {author} as they were")
+            times[author].defer()
+            continue
+        times[author].save()
         with open(f'meta/{author}.errors', 'w') as f:
-            for e in errors:
+            for e in errors + grouping_errors[author]:
                 f.write(f"{e}\n")
 
-    with open('docs/database.json', 'w+') as db_json:
-        json.dump(json_catalogue, db_json, indent=0)
-
-    def txt(parent, title, text, **kwargs):
-        e = ET.SubElement(parent, title, kwargs)
-        e.text = text
-        return e
-
-    guids = set()
-
-    ET.register_namespace('atom', 'http://www.w3.org/2005/Atom')
-    rss_feed = ET.Element('rss', attrib={'xmlns:atom': 'http://www.w3.org/2005/Atom', 'version': '2.0'})
-    channel = ET.SubElement(rss_feed, 'channel')
-    txt(channel, 'title', 'BEQCatalogue')
-    txt(channel, 'description', 'A RSS feed containing all BEQs created in the last 2 weeks')
-    txt(channel, 'link', 'https://beqcatalogue.readthedocs.io/')
-    txt(channel, 'language', 'en-gb')
-    txt(channel, 'pubDate', formatdate())
-    atom = ET.SubElement(channel, 'atom:link', href='https://beqcatalogue.readthedocs.io/en/latest/rss.xml', ref='self',
-                         type='application/rss+xml')
-    for fresh in sorted([c for c in json_catalogue if c.get('created_at', 0) >= TWO_WEEKS_AGO
-                                                      or c.get('updated_at', 0) >= TWO_WEEKS_AGO],
-                        key=lambda c: max(c.get('created_at', 0), c.get('updated_at', 0)), reverse=True):
-        guid = fresh['digest']
-        sz = len(guids)
-        guids.add(guid)
-        if len(guids) != sz:
-            item = ET.SubElement(channel, 'item')
-            txt(item, 'title', fresh['title'])
-            txt(item, 'link', fresh['catalogue_url'])
-            txt(item, 'description', fresh['overview'])
-            txt(item, 'pubDate', formatdate(max(fresh.get('created_at', 0), fresh.get('updated_at', 0))))
-            txt(item, 'category', fresh['content_type'])
-            txt(item, 'category', fresh['author'])
-            txt(item, 'guid', fresh['digest'], isPermaLink='false')
-    tree = ET.ElementTree(rss_feed)
-    tree.write("docs/rss/rss.xml", xml_declaration=True, encoding='utf-8')
+    print(f"Wrote {db_json_writer.count} entries to {db_json_writer.path}")
+    with build_report.stage('responses'):
+        responses.save()
+
+    if profiler:
+        profiler.disable()
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        profiler.dump_stats(f"{CACHE_DIR}/build.prof")
+        print(f"Profile written to {CACHE_DIR}/build.prof")
+    build_report.save()
+    if incomplete_authors:
+        print(f"Not publishing as the catalogue is incomplete for {', '.join(sorted(incomplete_authors))}")
+        sys.exit(1)
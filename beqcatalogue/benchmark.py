@@ -0,0 +1,329 @@
+import argparse
+import copy
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+from collections import Counter, defaultdict
+
+from columnar import CatalogueExport, read_columns
+from corpus import generate, generate_retained, make_bare
+from iir import xml_to_filt
+from jsonwriter import JsonArrayWriter
+from minidsp import read_minidsp
+
+
+def find_inputs(input_dir: str) -> list[str]:
+    files = sorted(glob.glob(f"{input_dir}/**/*.xml", recursive=True))
+    print(f"Found {len(files)} files in {input_dir}")
+    return files
+
+
+def time_it(fn, files) -> float:
+    start = time.perf_counter()
+    for f in files:
+        fn(f)
+    return time.perf_counter() - start
+
+
+def peak_memory(fn, files) -> tuple[int, float]:
+    ''' :return: the max and mean peak traced memory in bytes while processing a single file. '''
+    peaks = []
+    tracemalloc.start()
+    try:
+        for f in files:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            fn(f)
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+    return max(peaks, default=0), sum(peaks) / max(len(peaks), 1)
+
+
+def full_parse(file):
+    return ET.parse(file).getroot()
+
+
+def bench_parse(args):
+    ''' compares a full ElementTree parse with the streaming minidsp reader. '''
+    files = find_inputs(args.input)
+    if not files:
+        return
+    for name, fn in (('ET.parse', full_parse), ('read_minidsp', read_minidsp)):
+        elapsed = min(time_it(fn, files) for _ in range(args.repeat))
+        max_peak, mean_peak = peak_memory(fn, files)
+        print(f"{name:>14}: {elapsed:.3f}s total, {elapsed / len(files) * 1000:.3f}ms/file, "
+              f"peak {max_peak / 1024:.1f}KiB max, {mean_peak / 1024:.1f}KiB mean per file")
+
+
+def bench_filters(args):
+    ''' measures the memory retained by the filters built for every input file. '''
+    files = find_inputs(args.input)
+    parsed = []
+    for f in files:
+        try:
+            parsed.append((f, read_minidsp(f).filters))
+        except Exception:
+            pass
+
+    def build() -> list:
+        built = []
+        for f, elements in parsed:
+            try:
+                built.append(xml_to_filt(f, unroll=True, root=elements))
+            except Exception:
+                pass
+        return built
+
+    # warm up so any shared coefficients are not counted against the filters
+    build()
+    tracemalloc.start()
+    start = time.perf_counter()
+    filters = build()
+    elapsed = time.perf_counter() - start
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    count = sum(len(f) for f in filters)
+    distinct = len({id(b) for f in filters for b in f})
+    print(f"Built {count} filters ({distinct} objects) for {len(filters)} files in {elapsed:.3f}s, "
+          f"retaining {retained / 1024:.1f}KiB, {retained / max(count, 1):.1f} bytes/filter")
+
+
+def print_per_line(path: str, lines: list[str]):
+    with open(path, mode='w+') as f:
+        for line in lines:
+            print(line, file=f)
+
+
+def buffered(path: str, lines: list[str]):
+    with open(path, mode='w+') as f:
+        f.write('\n'.join(lines) + '\n' if lines else '')
+
+
+def bench_render(args):
+    ''' compares printing every line of each existing docs page to the file with writing the joined page once. '''
+    pages = []
+    for p in sorted(glob.glob(f"{args.docs}/*/*.md")):
+        with open(p) as f:
+            content = f.read()
+        if content.endswith('\n'):
+            pages.append(content[:-1].split('\n'))
+    print(f"Rendering {len(pages)} pages, {sum(len(p) for p in pages)} lines")
+    with tempfile.TemporaryDirectory() as tmp:
+        outputs = {}
+        for name, fn in (('print per line', print_per_line), ('buffered', buffered)):
+            elapsed = min(time_it(lambda i: fn(os.path.join(tmp, f"{name[0]}{i}.md"), pages[i]), range(len(pages)))
+                          for _ in range(args.repeat))
+            outputs[name] = []
+            for i in range(len(pages)):
+                with open(os.path.join(tmp, f"{name[0]}{i}.md"), 'rb') as f:
+                    outputs[name].append(f.read())
+            print(f"{name:>14}: {elapsed:.3f}s total, {elapsed / max(len(pages), 1) * 1000:.3f}ms/page")
+        print(f"Output identical: {outputs['print per line'] == outputs['buffered']}")
+
+
+def produce_entries(source: list[dict], count: int):
+    ''' yields count fresh copies of the source entries, standing in for entries generated one at a time. '''
+    for i in range(count):
+        yield copy.deepcopy(source[i % len(source)])
+
+
+def dump_all(path: str, source: list[dict], count: int):
+    with open(path, 'w+') as f:
+        json.dump(list(produce_entries(source, count)), f, indent=0)
+
+
+def stream(path: str, source: list[dict], count: int):
+    with JsonArrayWriter(path) as w:
+        for e in produce_entries(source, count):
+            w.write(e)
+
+
+def bench_json(args):
+    ''' compares accumulating every entry then dumping database.json with streaming each entry as it is produced. '''
+    with open(args.source, 'r', encoding='utf-8') as f:
+        source = json.load(f)
+    if not source:
+        print(f"No entries found in {args.source}")
+        return
+    count = args.entries or len(source)
+    print(f"Writing {count} entries copied from {len(source)} in {args.source}")
+    with tempfile.TemporaryDirectory() as tmp:
+        outputs = {}
+        for name, fn in (('json.dump', dump_all), ('streaming', stream)):
+            path = os.path.join(tmp, f"{name}.json")
+            elapsed = min(time_it(lambda _: fn(path, source, count), [None]) for _ in range(args.repeat))
+            max_peak, _ = peak_memory(lambda _: fn(path, source, count), [None])
+            with open(path, 'rb') as f:
+                outputs[name] = f.read()
+            print(f"{name:>14}: {elapsed:.3f}s, peak {max_peak / 1024 / 1024:.1f}MiB")
+        print(f"Output identical: {outputs['json.dump'] == outputs['streaming']}")
+
+
+def scan_json(path: str) -> tuple[Counter, Counter, Counter]:
+    with open(path, 'r', encoding='utf-8') as f:
+        entries = json.load(f)
+    audio_types = Counter(at for e in entries for at in e.get('audioTypes', []))
+    authors = Counter(e['author'] for e in entries)
+    freqs = Counter(round(f['freq']) for e in entries for f in e.get('filters', []))
+    return audio_types, authors, freqs
+
+
+def scan_columnar(output_dir: str) -> tuple[Counter, Counter, Counter]:
+    entries = read_columns(os.path.join(output_dir, 'entries.col'), ['audioTypes', 'author'])
+    filters = read_columns(os.path.join(output_dir, 'filters.col'), ['freq'])
+    audio_types = Counter(at for ats in entries['audioTypes'] for at in ats)
+    authors = Counter(entries['author'])
+    freqs = Counter(map(round, filters['freq']))
+    return audio_types, authors, freqs
+
+
+def bench_columnar(args):
+    ''' compares scanning database.json with scanning the columnar export for audio type, author and freq counts. '''
+    with open(args.source, 'r', encoding='utf-8') as f:
+        source = json.load(f)
+    if not source:
+        print(f"No entries found in {args.source}")
+        return
+    count = args.entries or len(source)
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, 'database.json')
+        export = CatalogueExport(tmp)
+        with JsonArrayWriter(json_path) as w:
+            for e in produce_entries(source, count):
+                w.write(e)
+                export.add(e)
+        export.save()
+        print(f"database.json is {os.path.getsize(json_path) / 1024 / 1024:.1f}MiB, columnar is "
+              f"{sum(os.path.getsize(p) for p in (export.entries.path, export.filters.path)) / 1024 / 1024:.1f}MiB")
+        results = {}
+        for name, fn in (('json', lambda _: scan_json(json_path)), ('columnar', lambda _: scan_columnar(tmp))):
+            elapsed = min(time_it(fn, [None]) for _ in range(args.repeat))
+            max_peak, _ = peak_memory(fn, [None])
+            results[name] = fn(None)
+            print(f"{name:>14}: {elapsed:.3f}s, peak {max_peak / 1024 / 1024:.1f}MiB")
+        print(f"Results identical: {results['json'] == results['columnar']}")
+
+
+def run_build(root: str, workers: int, incremental: bool, git_objects: bool = False, timeout: float = None) -> dict:
+    '''
+    runs the full build in root, the log is written to root/build.log.
+    :param timeout: seconds after which the build is killed and treated as a failure.
+    :return: the build report.
+    '''
+    cmd = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), '__init__.py'),
+           '--workers', str(workers)]
+    if incremental:
+        cmd.append('--incremental')
+    if git_objects:
+        cmd.append('--git-objects')
+    with open(os.path.join(root, 'build.log'), 'a') as log:
+        subprocess.run(cmd, cwd=root, stdout=log, stderr=subprocess.STDOUT, check=True, timeout=timeout)
+    with open(os.path.join(root, '.cache', 'build.json')) as f:
+        return json.load(f)
+
+
+def summarise_build(report: dict) -> dict:
+    stages = defaultdict(float)
+    for s in report['stages']:
+        stages[s['stage']] += s['wall']
+    parsed = sum(l['count'] for l in report['parse_latency'].values())
+    parse_ms = sum(l['total_ms'] for l in report['parse_latency'].values())
+    rss = report['peak_rss_kib']
+    return {
+        'wall': report['wall'],
+        'stages': {k: round(v, 3) for k, v in stages.items()},
+        'files_parsed': parsed,
+        'parse_ms_per_file': round(parse_ms / parsed, 3) if parsed else None,
+        'peak_rss_mib': round(max(rss.values()) / 1024, 1) if rss else None
+    }
+
+
+def describe_change(value: float | None, baseline: float | None) -> str:
+    if value is None or not baseline:
+        return ''
+    return f" ({(value - baseline) / baseline * 100:+.0f}%)"
+
+
+def bench_pipeline(args):
+    ''' times each stage of the full build on synthetic corpora of increasing size. '''
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['runs']
+    results = {'python': platform.python_version(), 'workers': args.workers, 'seed': args.seed,
+               'git_objects': args.git_objects, 'runs': {}}
+    for files in args.files:
+        with tempfile.TemporaryDirectory() as root:
+            written = generate(root, files, seed=args.seed)
+            generate_retained(root, int(files * args.retained), seed=args.seed)
+            if args.git_objects:
+                make_bare(root)
+            os.makedirs(os.path.join(root, 'docs', 'rss'), exist_ok=True)
+            build_args = (root, args.workers, args.incremental, args.git_objects, args.timeout)
+            runs = {'cold': summarise_build(run_build(*build_args))}
+            if args.incremental:
+                runs['warm'] = summarise_build(run_build(*build_args))
+        results['runs'][str(files)] = runs
+        for name, run in runs.items():
+            base = baseline.get(str(files), {}).get(name, {})
+            print(f"{written} files, {name}: {run['wall']:.2f}s{describe_change(run['wall'], base.get('wall'))}, "
+                  f"{run['files_parsed']} parsed at {run['parse_ms_per_file']}ms/file"
+                  f"{describe_change(run['parse_ms_per_file'], base.get('parse_ms_per_file'))}, "
+                  f"peak rss {run['peak_rss_mib']}MiB{describe_change(run['peak_rss_mib'], base.get('peak_rss_mib'))}")
+            for stage, wall in run['stages'].items():
+                print(f"    {stage:>14}: {wall:.3f}s{describe_change(wall, base.get('stages', {}).get(stage))}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Benchmarks stages of the catalogue build')
+    sub_parsers = arg_parser.add_subparsers(dest='benchmark', required=True)
+    parse_parser = sub_parsers.add_parser('parse', help='full tree parse vs streaming read of minidsp files')
+    parse_parser.add_argument('--input', default='.input', help='directory containing minidsp xml files')
+    parse_parser.add_argument('--repeat', type=int, default=3, help='timing runs, the fastest is reported')
+    parse_parser.set_defaults(func=bench_parse)
+    filters_parser = sub_parsers.add_parser('filters', help='memory retained by the in memory filters')
+    filters_parser.add_argument('--input', default='.input', help='directory containing minidsp xml files')
+    filters_parser.set_defaults(func=bench_filters)
+    render_parser = sub_parsers.add_parser('render', help='print per line vs buffered writes of the docs pages')
+    render_parser.add_argument('--docs', default='docs', help='directory containing the generated pages')
+    render_parser.add_argument('--repeat', type=int, default=3, help='timing runs, the fastest is reported')
+    render_parser.set_defaults(func=bench_render)
+    json_parser = sub_parsers.add_parser('json', help='dumping the whole catalogue vs streaming it to database.json')
+    json_parser.add_argument('--source', default='docs/database.json', help='an existing catalogue to copy entries from')
+    json_parser.add_argument('--entries', type=int, default=0, help='number of entries to write, defaults to the source size')
+    json_parser.add_argument('--repeat', type=int, default=3, help='timing runs, the fastest is reported')
+    json_parser.set_defaults(func=bench_json)
+    columnar_parser = sub_parsers.add_parser('columnar', help='scanning database.json vs the columnar export')
+    columnar_parser.add_argument('--source', default='docs/database.json', help='an existing catalogue to copy entries from')
+    columnar_parser.add_argument('--entries', type=int, default=0, help='number of entries to scan, defaults to the source size')
+    columnar_parser.add_argument('--repeat', type=int, default=3, help='timing runs, the fastest is reported')
+    columnar_parser.set_defaults(func=bench_columnar)
+    pipeline_parser = sub_parsers.add_parser('pipeline', help='times each stage of the build on a synthetic corpus')
+    pipeline_parser.add_argument('--files', type=int, nargs='+', default=[1000, 10000, 50000],
+                                 help='corpus sizes to benchmark')
+    pipeline_parser.add_argument('--retained', type=float, default=0.25,
+                                 help='number of retained author entries as a proportion of the corpus size')
+    pipeline_parser.add_argument('--workers', type=int, default=os.cpu_count(), help='extraction processes')
+    pipeline_parser.add_argument('--incremental', action='store_true',
+                                 help='build with --incremental and also time a second, warm, build')
+    pipeline_parser.add_argument('--git-objects', action='store_true',
+                                 help='commit the corpus to bare repositories and build with --git-objects')
+    pipeline_parser.add_argument('--timeout', type=float, help='fail a build which takes longer than this many seconds')
+    pipeline_parser.add_argument('--seed', type=int, default=1, help='seed for the synthetic corpus')
+    pipeline_parser.add_argument('--output', help='write the results as json to this file')
+    pipeline_parser.add_argument('--baseline', help='a results file from an earlier run to compare against')
+    pipeline_parser.set_defaults(func=bench_pipeline)
+    parsed = arg_parser.parse_args()
+    parsed.func(parsed)
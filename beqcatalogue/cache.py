@@ -0,0 +1,97 @@
+import copy
+import gzip
+import hashlib
+import json
+import os
+import traceback
+from csv import reader
+
+CACHE_DIR = '.cache'
+# bump whenever extract_from_repo changes the shape or content of the meta it produces
+CACHE_VERSION = 1
+
+
+def git_blob_sha(file_name: str) -> str:
+    ''' computes the object id git assigns to the file contents when stored as a blob '''
+    with open(file_name, 'rb') as f:
+        content = f.read()
+    h = hashlib.sha1(f"blob {len(content)}\0".encode('utf-8'))
+    h.update(content)
+    return h.hexdigest()
+
+
+def load_diff(author: str) -> set[str]:
+    ''' loads the git paths listed in meta/<author>.diff, i.e. those changed since meta/<author>.sha '''
+    changed = set()
+    if os.path.isfile(f"meta/{author}.diff"):
+        with open(f"meta/{author}.diff") as f:
+            for row in reader(f):
+                if row:
+                    changed.add(row[0])
+    return changed
+
+
+class ExtractCache:
+    '''
+    Persists the meta extracted from each author file, keyed by git path and blob sha, so that only files which have
+    changed upstream are parsed again. When the blob sha is not supplied by the caller, files listed in
+    meta/<author>.diff are always rehashed and anything else is trusted if its size and mtime are unchanged since the
+    last run.
+    '''
+
+    def __init__(self, author: str):
+        self.author = author
+        self.path = f"{CACHE_DIR}/{author}.json.gz"
+        self.changed = load_diff(author)
+        self.hits = 0
+        self.misses = 0
+        self.__files: dict[str, dict] = {}
+        self.__seen_files: dict[str, dict] = {}
+        self.__load()
+
+    def __load(self):
+        if os.path.isfile(self.path):
+            try:
+                with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version', None) == CACHE_VERSION:
+                    self.__files = data['files']
+                else:
+                    print(f"Ignoring outdated extract cache for {self.author}")
+            except Exception:
+                print(f"Failed to load extract cache from {self.path}")
+                traceback.print_exc()
+
+    def get(self, git_path: str, file_name: str, sha: str | None = None) -> tuple[dict, dict | None]:
+        '''
+        :param sha: the blob sha, if known, in which case the file is not touched.
+        :return: the cache key for the file along with a copy of the cached meta if the file is unchanged.
+        '''
+        cached = self.__files.get(git_path, None)
+        if sha is not None:
+            stamp = None
+        else:
+            st = os.stat(file_name)
+            stamp = [st.st_size, st.st_mtime_ns]
+            if cached and git_path not in self.changed and cached['stamp'] == stamp:
+                sha = cached['sha']
+            else:
+                sha = git_blob_sha(file_name)
+        key = {'sha': sha, 'stamp': stamp}
+        if cached and cached['sha'] == sha:
+            self.hits += 1
+            self.__seen_files[git_path] = {**key, 'meta': cached['meta']}
+            return key, copy.deepcopy(cached['meta'])
+        self.misses += 1
+        return key, None
+
+    def put(self, git_path: str, key: dict, meta: dict):
+        self.__seen_files[git_path] = {**key, 'meta': copy.deepcopy(meta)}
+
+    def save(self):
+        ''' persists the files seen in this run, anything no longer present upstream is dropped '''
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with gzip.open(self.path, 'wt', encoding='utf-8') as f:
+            json.dump({'version': CACHE_VERSION, 'files': self.__seen_files}, f)
+        print(f"Extract cache for {self.author}: {self.hits} hits, {self.misses} misses, "
+              f"{len(self.changed)} changed in diff")
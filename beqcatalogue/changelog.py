@@ -0,0 +1,218 @@
+'''
+Works out what changed in the catalogue since the previous build and publishes the changes as RSS feeds.
+
+The digest of every entry is recorded in meta/catalogue.digests.csv as digest,author,content_type,key,title,catalogue_url
+rows, sorted by digest so successive versions diff cleanly. Each build compares its digests with that file:
+
+    added   : a digest which was not in the previous build
+    changed : an added digest whose key, i.e. author, content type and underlying file name (or title if there is none),
+              matches a digest which has gone
+    removed : a digest which has gone without being replaced
+
+added and changed entries are only published if they were created or updated upstream within FEED_WINDOW so that a
+change in how entries are generated does not flood the feeds, removals are published as of the build. Published events
+are kept in meta/feed.json until they are older than FEED_WINDOW and the feeds are rendered from those events:
+
+    docs/rss/rss.xml                    : every event
+    docs/rss/author/<author>.xml        : the events for each author
+    docs/rss/type/<content type>.xml    : the events for each content type, i.e. film.xml and tv.xml
+
+Without a previous digests file every entry counts as added, i.e. the feed holds every entry created or updated within
+FEED_WINDOW. The digests of an author which produced no entries, or whose extraction failed, are never removed, they are
+carried over to the next build instead so a missing repository does not publish the whole catalogue as churn.
+'''
+import csv
+import io
+import json
+import os
+import time
+import traceback
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+from email.utils import formatdate
+
+from pages import PageWriter
+
+FEED_WINDOW = 2 * 7 * 24 * 60 * 60
+DIGESTS_PATH = 'meta/catalogue.digests.csv'
+STATE_PATH = 'meta/feed.json'
+STATE_VERSION = 1
+FEED_DIR = 'docs/rss'
+SITE_URL = 'https://beqcatalogue.readthedocs.io'
+
+
+def entry_key(entry: dict) -> str:
+    return entry.get('underlying', None) or entry.get('title', '')
+
+
+def load_digests(path: str) -> dict[str, list[str]]:
+    ''' :return: author, content_type, key, title and catalogue_url by digest. '''
+    digests = {}
+    if os.path.isfile(path):
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.reader(f):
+                if row:
+                    digests[row[0]] = row[1:]
+    return digests
+
+
+class Changelog:
+
+    def __init__(self, digests_path: str = DIGESTS_PATH, state_path: str = STATE_PATH):
+        self.digests_path = digests_path
+        self.state_path = state_path
+        self.now = int(time.time())
+        self.since = time.time() - FEED_WINDOW
+        self.__previous = load_digests(digests_path)
+        self.__current: dict[str, list[str]] = {}
+        self.__kept: set[str] = set()
+        # the feed fields of each entry which was not in the previous build and was created or updated in the window
+        self.__fresh: dict[str, dict] = {}
+
+    def add(self, entry: dict):
+        d = entry['digest']
+        if d not in self.__current:
+            self.__current[d] = [entry['author'], entry.get('content_type', ''), entry_key(entry), entry['title'],
+                                 entry.get('catalogue_url', '')]
+        if d not in self.__previous:
+            at = max(entry.get('created_at', 0), entry.get('updated_at', 0))
+            if at >= self.since and (d not in self.__fresh or at > self.__fresh[d]['at']):
+                self.__fresh[d] = {
+                    'kind': 'added',
+                    'digest': d,
+                    'title': entry['title'],
+                    'author': entry['author'],
+                    'content_type': entry.get('content_type', ''),
+                    'catalogue_url': entry.get('catalogue_url', ''),
+                    'overview': entry.get('overview', ''),
+                    'at': at
+                }
+
+    def keep(self, author: str):
+        ''' the author's previous digests are not removed, e.g. as its extraction failed. '''
+        self.__kept.add(author)
+
+    def finish(self) -> list[dict]:
+        '''
+        diffs the catalogue against the previous build, saves the digests and the feed state.
+        :return: the events to publish, newest first.
+        '''
+        removed = {d: row for d, row in self.__previous.items() if d not in self.__current}
+        removed_by_key = defaultdict(list)
+        for d, row in removed.items():
+            removed_by_key[tuple(row[0:3])].append(d)
+        events = []
+        counts = defaultdict(int)
+        for d, row in self.__current.items():
+            if d not in self.__previous:
+                gone = removed_by_key.get(tuple(row[0:3]), None)
+                previous = gone.pop(0) if gone else None
+                if previous:
+                    del removed[previous]
+                counts['changed' if previous else 'added'] += 1
+                if d in self.__fresh:
+                    event = self.__fresh[d]
+                    if previous:
+                        event['kind'] = 'changed'
+                        event['previous'] = previous
+                    events.append(event)
+        kept = self.__kept | ({row[0] for row in self.__previous.values()} - {row[0] for row in self.__current.values()})
+        if kept:
+            print(f"Keeping the previous digests for {', '.join(sorted(kept))}")
+        for d, row in removed.items():
+            author, content_type, _, title, catalogue_url = row
+            if author in kept:
+                self.__current[d] = row
+                continue
+            counts['removed'] += 1
+            events.append({'kind': 'removed', 'digest': d, 'title': title, 'author': author,
+                           'content_type': content_type, 'catalogue_url': catalogue_url, 'overview': '',
+                           'at': self.now})
+        print(f"Changelog: {counts['added']} added, {counts['changed']} changed, {counts['removed']} removed, "
+              f"{len(events)} published")
+        if sum(counts.values()):
+            self.__save_digests()
+        return self.__update_state(events)
+
+    def __save_digests(self):
+        os.makedirs(os.path.dirname(self.digests_path), exist_ok=True)
+        with open(f"{self.digests_path}.tmp", 'w', newline='', encoding='utf-8') as f:
+            w = csv.writer(f)
+            for d in sorted(self.__current.keys()):
+                w.writerow([d, *self.__current[d]])
+        os.replace(f"{self.digests_path}.tmp", self.digests_path)
+
+    def __update_state(self, events: list[dict]) -> list[dict]:
+        ''' adds the events to those published by previous builds, dropping any which have left the window. '''
+        published = []
+        if os.path.isfile(self.state_path):
+            try:
+                with open(self.state_path, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+                if state.get('version', None) == STATE_VERSION:
+                    published = state['events']
+            except Exception:
+                print(f"Failed to load feed state from {self.state_path}")
+                traceback.print_exc()
+        guids = {event_guid(e) for e in events}
+        events = [e for e in published if e['at'] >= self.since and event_guid(e) not in guids] + events
+        events.sort(key=lambda e: e['at'], reverse=True)
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        with open(self.state_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': STATE_VERSION, 'events': events}, f, indent=0)
+        return events
+
+
+def event_guid(event: dict) -> str:
+    return f"removed:{event['digest']}" if event['kind'] == 'removed' else event['digest']
+
+
+def render_feed(description: str, href: str, events: list[dict], title: str = 'BEQCatalogue') -> str:
+    def txt(parent, tag, text, **kwargs):
+        e = ET.SubElement(parent, tag, kwargs)
+        e.text = text
+        return e
+
+    ET.register_namespace('atom', 'http://www.w3.org/2005/Atom')
+    rss_feed = ET.Element('rss', attrib={'xmlns:atom': 'http://www.w3.org/2005/Atom', 'version': '2.0'})
+    channel = ET.SubElement(rss_feed, 'channel')
+    txt(channel, 'title', title)
+    txt(channel, 'description', description)
+    txt(channel, 'link', f"{SITE_URL}/")
+    txt(channel, 'language', 'en-gb')
+    if events:
+        txt(channel, 'pubDate', formatdate(events[0]['at']))
+    ET.SubElement(channel, 'atom:link', href=href, ref='self', type='application/rss+xml')
+    for event in events:
+        item = ET.SubElement(channel, 'item')
+        txt(item, 'title', f"Removed: {event['title']}" if event['kind'] == 'removed' else event['title'])
+        txt(item, 'link', event['catalogue_url'])
+        txt(item, 'description', event['overview'])
+        txt(item, 'pubDate', formatdate(event['at']))
+        txt(item, 'category', event['content_type'])
+        txt(item, 'category', event['author'])
+        if event['kind'] != 'added':
+            txt(item, 'category', event['kind'])
+        txt(item, 'guid', event_guid(event), isPermaLink='false')
+    out = io.BytesIO()
+    ET.ElementTree(rss_feed).write(out, xml_declaration=True, encoding='utf-8')
+    return out.getvalue().decode('utf-8')
+
+
+def write_feeds(events: list[dict], authors: list[str], content_types: list[str], page_writer: PageWriter):
+    ''' writes the global feed along with one per author and per content type, unchanged feeds are not rewritten. '''
+    feeds = {'rss.xml': ('A RSS feed containing all BEQs created in the last 2 weeks', events)}
+    hrefs = {'rss.xml': f"{SITE_URL}/en/latest/rss.xml"}
+    for author in authors:
+        feeds[f"author/{author}.xml"] = (f"A RSS feed containing all BEQs by {author} created in the last 2 weeks",
+                                         [e for e in events if e['author'] == author])
+    for content_type in content_types:
+        feeds[f"type/{content_type.lower()}.xml"] = (f"A RSS feed containing all {content_type} BEQs created in the "
+                                                     f"last 2 weeks",
+                                                     [e for e in events if e['content_type'] == content_type])
+    written = 0
+    for name, (description, feed_events) in feeds.items():
+        href = hrefs.get(name, f"{SITE_URL}/en/latest/rss/{name}")
+        if page_writer.write(f"{FEED_DIR}/{name}", render_feed(description, href, feed_events)):
+            written += 1
+    print(f"Feeds: {len(events)} events in {len(feeds)} feeds, {written} written")
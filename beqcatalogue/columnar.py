@@ -0,0 +1,166 @@
+'''
+Exports the catalogue as column oriented tables so analytics can scan a few columns without loading every entry.
+
+Each table is a single file laid out as
+
+    prefix : magic b'BEQC', uint16 version, uint32 header length
+    header : utf-8 json {'rows': n, 'columns': [{'name', 'type', 'blocks': {part: [offset, length]}}]}
+    blocks : zlib compressed column data, offsets are relative to the end of the header
+
+columns are one of
+
+    int   : values  -> int64
+    float : values  -> float64
+    str   : dict    -> json list of distinct values, codes -> int32 index into dict or -1 if missing
+    strs  : as str plus lengths -> int32 number of values in each row
+
+all numbers are little endian. Two tables are written, entries.col with one row per catalogue entry and filters.col
+with one row per filter where entry is the row of the owning entry in entries.col.
+'''
+import array
+import json
+import os
+import struct
+import zlib
+from typing import BinaryIO
+
+from response import from_bytes, to_bytes
+
+MAGIC = b'BEQC'
+VERSION = 1
+PREFIX = struct.Struct('<4sHI')
+
+ENTRY_COLUMNS = [('title', 'str'), ('year', 'str'), ('content_type', 'str'), ('author', 'str'), ('digest', 'str'),
+                 ('underlying', 'str'), ('theMovieDB', 'str'), ('season', 'str'), ('episode', 'str'),
+                 ('language', 'str'), ('source', 'str'), ('edition', 'str'), ('rating', 'str'), ('runtime', 'str'),
+                 ('created_at', 'int'), ('updated_at', 'int'), ('audioTypes', 'strs'), ('audioCodecs', 'strs'),
+                 ('audioChannelCounts', 'strs'), ('genres', 'strs'), ('filter_count', 'int')]
+FILTER_COLUMNS = [('entry', 'int'), ('type', 'str'), ('freq', 'float'), ('gain', 'float'), ('q', 'float'),
+                  ('count', 'int')]
+
+
+class ColumnarWriter:
+
+    def __init__(self, path: str, columns: list[tuple[str, str]]):
+        self.path = path
+        self.rows = 0
+        self.__columns = columns
+        self.__data: list[dict] = []
+        for _, col_type in columns:
+            if col_type == 'int':
+                self.__data.append({'values': array.array('q')})
+            elif col_type == 'float':
+                self.__data.append({'values': array.array('d')})
+            elif col_type == 'str':
+                self.__data.append({'dict': {}, 'codes': array.array('i')})
+            elif col_type == 'strs':
+                self.__data.append({'dict': {}, 'codes': array.array('i'), 'lengths': array.array('i')})
+            else:
+                raise ValueError(f"Unknown column type {col_type}")
+
+    @staticmethod
+    def __code(lookup: dict, value) -> int:
+        if value is None:
+            return -1
+        code = lookup.get(value, None)
+        if code is None:
+            code = lookup[value] = len(lookup)
+        return code
+
+    def append(self, values: list):
+        ''' adds a row, values are in column order. '''
+        for (_, col_type), data, value in zip(self.__columns, self.__data, values):
+            if col_type == 'str':
+                data['codes'].append(self.__code(data['dict'], value))
+            elif col_type == 'strs':
+                value = value or []
+                data['lengths'].append(len(value))
+                data['codes'].extend([self.__code(data['dict'], v) for v in value])
+            else:
+                data['values'].append(value if value is not None else 0)
+        self.rows += 1
+
+    def save(self):
+        header = {'rows': self.rows, 'columns': []}
+        blocks = []
+        offset = 0
+        for (name, col_type), data in zip(self.__columns, self.__data):
+            parts = {}
+            for part, value in data.items():
+                raw = json.dumps(list(value)).encode('utf-8') if part == 'dict' else to_bytes(value)
+                block = zlib.compress(raw)
+                parts[part] = [offset, len(block)]
+                offset += len(block)
+                blocks.append(block)
+            header['columns'].append({'name': name, 'type': col_type, 'blocks': parts})
+        header_bytes = json.dumps(header).encode('utf-8')
+        with open(self.path, 'wb') as f:
+            f.write(PREFIX.pack(MAGIC, VERSION, len(header_bytes)))
+            f.write(header_bytes)
+            for block in blocks:
+                f.write(block)
+
+
+def read_header(f: BinaryIO) -> tuple[dict, int]:
+    ''' :return: the header and the offset at which the blocks start. '''
+    magic, version, length = PREFIX.unpack(f.read(PREFIX.size))
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{f.name} is not a version {VERSION} columnar file")
+    return json.loads(f.read(length)), PREFIX.size + length
+
+
+def read_columns(path: str, names: list[str] | None = None) -> dict[str, list | array.array]:
+    '''
+    Reads the named columns, only the blocks for those columns are read from the file.
+    :return: values by column name, int and float columns are arrays, str columns are lists with None for missing
+    values and strs columns are a list of lists.
+    '''
+    columns = {}
+    with open(path, 'rb') as f:
+        header, start = read_header(f)
+
+        def read(block):
+            f.seek(start + block[0])
+            return zlib.decompress(f.read(block[1]))
+
+        for c in header['columns']:
+            if names is not None and c['name'] not in names:
+                continue
+            blocks = c['blocks']
+            if c['type'] in ('int', 'float'):
+                columns[c['name']] = from_bytes('q' if c['type'] == 'int' else 'd', read(blocks['values']))
+                continue
+            lookup = json.loads(read(blocks['dict'])) + [None]
+            values = [lookup[code] for code in from_bytes('i', read(blocks['codes']))]
+            if c['type'] == 'strs':
+                rows = []
+                i = 0
+                for n in from_bytes('i', read(blocks['lengths'])):
+                    rows.append(values[i:i + n])
+                    i += n
+                values = rows
+            columns[c['name']] = values
+    return columns
+
+
+class CatalogueExport:
+    ''' collects catalogue entries into the entries and exploded filters tables. '''
+
+    def __init__(self, output_dir: str):
+        os.makedirs(output_dir, exist_ok=True)
+        self.entries = ColumnarWriter(os.path.join(output_dir, 'entries.col'), ENTRY_COLUMNS)
+        self.filters = ColumnarWriter(os.path.join(output_dir, 'filters.col'), FILTER_COLUMNS)
+
+    def add(self, entry: dict):
+        filters = entry.get('filters', [])
+        for f in filters:
+            self.filters.append([self.entries.rows, f.get('type', None), f.get('freq', None), f.get('gain', None),
+                                 f.get('q', None), f.get('count', 1)])
+        self.entries.append([len(filters) if name == 'filter_count' else entry.get(name, None)
+                             for name, _ in ENTRY_COLUMNS])
+
+    def save(self):
+        self.entries.save()
+        self.filters.save()
+        print(f"Exported {self.entries.rows} entries and {self.filters.rows} filters to {self.entries.path} "
+              f"and {self.filters.path}")
@@ -0,0 +1,195 @@
+'''
+Generates a synthetic corpus of MiniDSP BEQ files, laid out like the author repositories in repos.py, so the build can
+be benchmarked offline.
+
+Every file has a beq_metadata block in the format described in extract_from_repo along with the PEQ_<channel>_<slot>
+filters read by iir. The corpus covers the cases the build has to handle:
+
+    * input 1 and 2 carrying the same filters, plus bypassed and 0 gain slots which are ignored
+    * stacked (repeated) low shelves, high shelves and peaking filters
+    * TV files using the season element, a bare season number with the episode in the title or in the note
+    * films sharing a title, files nested in sub directories and the occasional file which fails to extract
+
+Files are created with meta/<author>.diff listing each file with a creation time in the last 6 weeks, as
+inputs.py would for a fresh clone. The repositories can then be committed and replaced with bare clones, as
+inputs.py --bare leaves them, to build with --git-objects. Entries for the retained authors can be written to
+docs/database.json and docs/database.csv. The output depends only on the seed.
+'''
+import csv
+import json
+import os
+import random
+import shutil
+import subprocess
+import time
+
+from repos import REPO_CONFIGS, RETAINED_AUTHORS
+
+AUDIO_TYPES = ['DTS-HD MA 5.1', 'TrueHD 7.1', 'Atmos', 'DD+ Atmos', 'DTS-X', 'DTS-HD.MA.5.1', 'DD+5 1',
+               'LPCM 2.0_to_mono']
+GENRES = ['Action', 'Drama', 'Science Fiction', 'Horror', 'Comedy']
+WORDS = ['Dark', 'Night', 'Star', 'River', 'Iron', 'Ghost', 'Storm', 'Blue', 'Last', 'City', 'Fire', 'Moon']
+# proportion of each author's files which are TV
+TV_SHARE = 0.25
+
+
+def make_filter(channel: int, slot: int, filter_type: str, freq: float, q: float, boost: float, bypass: int = 0) -> str:
+    return (f'<filter name="PEQ_{channel}_{slot}"><freq>{freq}</freq><q>{q}</q><boost>{boost}</boost>'
+            f'<type>{filter_type}</type><bypass>{bypass}</bypass><dec>1,2,3</dec><hex>00ff</hex></filter>')
+
+
+def make_file(r: random.Random, i: int, author: str, tv: bool) -> tuple[str, str]:
+    ''' :return: the file name and content. '''
+    title = ' '.join(r.sample(WORDS, r.randint(1, 3)))
+    if r.random() < 0.15:
+        title = f'Shared {i % 40}'
+    year = r.randint(1970, 2025)
+    audio_types = r.sample(AUDIO_TYPES, r.randint(1, 2))
+    md = [f'<beq_title>{title}</beq_title>' if r.random() > 0.02 else '<beq_title />',
+          f'<beq_sortTitle>{title}</beq_sortTitle>', f'<beq_year>{year}</beq_year>',
+          f'<beq_pvaURL>https://example.com/{i}.jpg</beq_pvaURL>']
+    if r.random() < 0.8:
+        md.append(f'<beq_spectrumURL>https://example.com/{i}s.jpg</beq_spectrumURL>')
+    if r.random() < 0.5:
+        md.append(f'<beq_gain>{r.choice(["+", "-", ""])}{r.randint(0, 4)}.{r.randint(0, 9)} gain</beq_gain>')
+    if r.random() < 0.7:
+        md.append(f'<beq_theMovieDB>{r.randint(1, 99999)}{chr(34) if r.random() < 0.02 else ""}</beq_theMovieDB>')
+    md.append(f'<beq_runtime>{r.randint(60, 200)}</beq_runtime>')
+    md.append(f'<beq_language>{"English" if r.random() < 0.8 else "French"}</beq_language>')
+    md.append(f'<beq_author>{author}</beq_author>')
+    if r.random() < 0.6:
+        md.append(f'<beq_avs>https://www.avsforum.com/threads/x/post-{i}</beq_avs>')
+    if r.random() < 0.2:
+        md.append(f'<beq_warning>Careful {i}</beq_warning>')
+    if r.random() < 0.3:
+        md.append(f'<beq_edition>Edition {i % 3}</beq_edition>')
+    if r.random() < 0.3:
+        md.append(f'<beq_overview>Overview &amp; text {i}</beq_overview>')
+    if r.random() < 0.1:
+        md.append(f'<beq_collection id="{i % 7}">Collection {i % 7}</beq_collection>')
+    if r.random() < 0.2:
+        md.append(f'<beq_rating>PG-{r.randint(1, 18)}</beq_rating>')
+    if r.random() < 0.1:
+        md.append(f'<beq_alt_title>Alt {title}</beq_alt_title>')
+    if tv:
+        mode = r.random()
+        if mode < 0.5:
+            n = r.randint(1, 10)
+            episodes = sorted(r.sample(range(1, n + 1), r.randint(1, n)))
+            md.append(f'<beq_season id="{r.randint(1, 9999)}"><number>{r.randint(1, 5)}</number>'
+                      f'<episodes count="{n}">{",".join(str(e) for e in episodes)}</episodes></beq_season>')
+        elif mode < 0.65:
+            md.append(f'<beq_season>{r.randint(1, 5)}</beq_season>')
+            md[0] = f'<beq_title>{title} E{r.randint(1, 20):02d}</beq_title>'
+        elif mode < 0.8:
+            md.append(f'<beq_season>{r.randint(1, 5)}</beq_season>')
+            md.append(f'<beq_note>{r.choice(["E3", "E2-5", "S1-E4", "Random"])}</beq_note>')
+    elif r.random() < 0.2:
+        md.append(f'<beq_note>Note {i}</beq_note>')
+    md.append('<beq_audioTypes>' + ''.join(f'<audioType>{a}</audioType>' for a in audio_types) + '</beq_audioTypes>')
+    md.append('<beq_genres>' + ''.join(f'<genre id="1">{g}</genre>' for g in r.sample(GENRES, 2)) + '</beq_genres>')
+
+    slots = [('SL', r.choice([10, 15, 20, 25]), 0.707, r.choice([2, 3, 4.5]))] * r.randint(0, 5)
+    for _ in range(r.randint(1, 4)):
+        slots.append(('PK', round(r.uniform(10, 120), 1), round(r.uniform(0.3, 3), 3), round(r.uniform(-6, 6), 1)))
+    if r.random() < 0.2:
+        slots.append(('SH', 80, 0.707, -2))
+    mismatched = r.random() < 0.01
+    filters = []
+    for channel in (1, 2):
+        for slot, (filter_type, freq, q, boost) in enumerate(slots):
+            if mismatched and channel == 2 and slot == 0:
+                boost += 1
+            filters.append(make_filter(channel, slot + 1, filter_type, freq, q, boost))
+        filters.append(make_filter(channel, len(slots) + 1, 'PK', 50, 1, 3, bypass=1))
+        filters.append(make_filter(channel, len(slots) + 2, 'PK', 50, 1, 0))
+    for slot in range(3):
+        filters.append(make_filter(3, slot + 1, 'PK', 100, 1, 1, bypass=1))
+
+    name = f"{title} S{i % 5} {audio_types[0]} {i}" if tv else f"{title} ({year}) {' + '.join(audio_types)}"
+    body = (f'<?xml version="1.0" encoding="utf-8"?>\n<setting>\n<beq_metadata>{"".join(md)}</beq_metadata>\n'
+            + '\n'.join(filters) + '\n<master_status>1</master_status>\n</setting>\n')
+    return f"{name.replace('/', ' ')} {i}.xml", body
+
+
+def generate(root: str, files: int, seed: int = 1) -> int:
+    '''
+    writes files spread evenly across the authors in repos.py, along with meta/<author>.diff for each one.
+    :return: the number of files written.
+    '''
+    r = random.Random(seed)
+    today = int(time.time()) // 86400 * 86400
+    per_author = files // len(REPO_CONFIGS)
+    written = 0
+    os.makedirs(f"{root}/meta", exist_ok=True)
+    for author, repo_path, film_sub, tv_sub in REPO_CONFIGS:
+        diff = []
+        tv_count = int(per_author * TV_SHARE)
+        for sub, is_tv, count in ((film_sub, False, per_author - tv_count), (tv_sub, True, tv_count)):
+            for i in range(count):
+                name, body = make_file(r, i, author, is_tv)
+                git_dir = sub + (f"/{WORDS[i % 3]}" if i % 4 == 0 else '')
+                os.makedirs(f"{root}/{repo_path}{git_dir}", exist_ok=True)
+                with open(f"{root}/{repo_path}{git_dir}/{name}", 'w', encoding='utf-8') as f:
+                    f.write(body)
+                diff.append(f'"{git_dir}/{name}",{today - r.randint(0, 40) * 86400}')
+                written += 1
+        with open(f"{root}/meta/{author}.diff", 'w') as f:
+            f.write('\n'.join(sorted(diff)) + '\n')
+    return written
+
+
+def make_bare(root: str):
+    ''' commits each author repository written by generate and replaces it with a bare clone. '''
+    for _, repo_path, _, _ in REPO_CONFIGS:
+        repo = f"{root}/{repo_path.rstrip('/')}"
+        git = ['git', '-c', 'user.name=corpus', '-c', 'user.email=corpus@localhost', '-C', repo]
+        subprocess.run([*git, 'init', '-q'], check=True)
+        subprocess.run([*git, 'add', '-A'], check=True)
+        subprocess.run([*git, 'commit', '-q', '-m', 'corpus'], check=True)
+        subprocess.run(['git', 'clone', '-q', '--bare', repo, f"{repo}.git"], check=True)
+        shutil.rmtree(repo)
+        os.rename(f"{repo}.git", repo)
+
+
+def make_retained_entry(r: random.Random, i: int, author: str, today: int) -> dict:
+    title = f"Retained {i}"
+    slug = title.lower().replace(' ', '-')
+    content_type = 'TV' if i % 3 == 0 else 'film'
+    audio_types = r.sample(AUDIO_TYPES[:5], r.randint(1, 2))
+    filters = []
+    for _ in range(r.randint(1, 6)):
+        freq = round(r.uniform(10, 120), 1)
+        filters.append({'type': r.choice(['LowShelf', 'PeakingEQ']), 'freq': freq, 'gain': round(r.uniform(-6, 6), 1),
+                        'q': 0.707, 'biquads': {'96000': {'b': ['1.0', f"{-2 + freq / 1e5:.10f}", '1.0'],
+                                                          'a': [f"{2 - freq / 1e5:.10f}", '-0.9999']}},
+                        'count': r.randint(1, 3)})
+    entry = {'title': title, 'year': str(r.randint(1970, 2025)), 'audioTypes': audio_types,
+             'content_type': content_type, 'author': author,
+             'catalogue_url': f"https://beqcatalogue.readthedocs.io/en/latest/{author}/{slug}",
+             'filters': filters, 'images': [f"https://example.com/{author}/{i}.jpg"], 'warning': '', 'mv': '0',
+             'avs': '', 'sortTitle': '', 'edition': '', 'note': '', 'language': 'English', 'source': 'Disc',
+             'overview': f"Overview {i}", 'theMovieDB': str(r.randint(1, 99999)), 'rating': '', 'runtime': '100',
+             'genres': r.sample(GENRES, 2), 'altTitle': '', 'collection': {}, 'underlying': f"{title} {author}",
+             'digest': f"{r.getrandbits(256):064x}", 'created_at': today - r.randint(0, 400) * 86400}
+    entry['updated_at'] = entry['created_at']
+    if content_type == 'TV':
+        entry['season'] = str(r.randint(1, 5))
+        entry['episode'] = ''
+    return entry
+
+
+def generate_retained(root: str, entries: int, seed: int = 1):
+    ''' writes entries for the retained authors to docs/database.json and docs/database.csv. '''
+    r = random.Random(seed)
+    today = int(time.time()) // 86400 * 86400
+    catalogue = [make_retained_entry(r, i, RETAINED_AUTHORS[i % len(RETAINED_AUTHORS)], today)
+                 for i in range(entries)]
+    os.makedirs(f"{root}/docs", exist_ok=True)
+    with open(f"{root}/docs/database.json", 'w', encoding='utf-8') as f:
+        json.dump(catalogue, f, indent=0)
+    with open(f"{root}/docs/database.csv", 'w', newline='', encoding='utf-8') as f:
+        w = csv.writer(f)
+        w.writerow(['Title', 'Year', 'Format', 'Author', 'AVS', 'Catalogue', 'blu-ray.com', 'filters'])
+        for e in catalogue:
+            w.writerow([e['title'], e['year'], ', '.join(e['audioTypes']), e['author'], '', e['catalogue_url'], '', ''])
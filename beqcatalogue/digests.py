@@ -0,0 +1,118 @@
+'''
+Computes the digest which identifies each catalogue entry, e.g. as the guid in the RSS feed, i.e. the sha256 of
+
+    json.dumps({'title': ..., 'filters': ..., 'mv': ..., 'season': ..., 'episode': ...})
+
+with any key the entry does not have omitted. The values must never change for an unchanged entry so the json is
+assembled from the encoding of each value, byte for byte as json.dumps would produce it, which lets the encoding of a
+filter set be reused by every entry with the same filters. Filter sets are identified by the compact form already
+written to database.csv, i.e. meta['filters'].
+
+When running incrementally the digests are also persisted to .cache/<author>.digests.json.gz by git path along with the
+blob sha of the file and the other values which were hashed, an entry whose file and values are unchanged is not hashed
+again.
+'''
+import gzip
+import hashlib
+import json
+import os
+import traceback
+from collections import OrderedDict
+
+from cache import CACHE_DIR, CACHE_VERSION
+
+DIGEST_KEYS = ['title', 'filters', 'mv', 'season', 'episode']
+FILTER_ENCODING_CACHE_SIZE = 4096
+# bump if the digest is computed from anything else, the extract cache version is also checked as the filters are
+# derived from the file by the extraction
+MANIFEST_VERSION = 1
+
+
+def digest(entry: dict) -> str:
+    ''' the reference implementation. '''
+    to_hash = json.dumps({k: entry[k] for k in DIGEST_KEYS if k in entry}).encode('utf-8')
+    return hashlib.sha256(to_hash).hexdigest()
+
+
+class FilterEncodings:
+    ''' a bounded LRU cache of the json encoding of each filter set. '''
+
+    def __init__(self, maxsize: int = FILTER_ENCODING_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.__entries: OrderedDict[str, str] = OrderedDict()
+
+    def get(self, filters_key: str, filters: list[dict]) -> str:
+        encoded = self.__entries.get(filters_key, None)
+        if encoded is None:
+            self.misses += 1
+            encoded = self.__entries[filters_key] = json.dumps(filters)
+            if len(self.__entries) > self.maxsize:
+                self.__entries.popitem(last=False)
+        else:
+            self.hits += 1
+            self.__entries.move_to_end(filters_key)
+        return encoded
+
+
+filter_encodings = FilterEncodings()
+
+
+def fast_digest(entry: dict, filters_key: str) -> str:
+    ''' :param filters_key: the compact form of entry['filters']. '''
+    parts = []
+    for k in DIGEST_KEYS:
+        if k in entry:
+            encoded = filter_encodings.get(filters_key, entry[k]) if k == 'filters' else json.dumps(entry[k])
+            parts.append(f'"{k}": {encoded}')
+    return hashlib.sha256(('{' + ', '.join(parts) + '}').encode('utf-8')).hexdigest()
+
+
+class DigestManifest:
+
+    def __init__(self, author: str):
+        self.author = author
+        self.path = f"{CACHE_DIR}/{author}.digests.json.gz"
+        self.hits = 0
+        self.misses = 0
+        # git path -> [blob sha, the other values which were hashed, digest]
+        self.__digests: dict[str, list] = {}
+        self.__seen: dict[str, list] = {}
+        self.__load()
+
+    def __load(self):
+        if os.path.isfile(self.path):
+            try:
+                with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get('version', None) == [MANIFEST_VERSION, CACHE_VERSION]:
+                    self.__digests = data['digests']
+                else:
+                    print(f"Ignoring outdated digest manifest for {self.author}")
+            except Exception:
+                print(f"Failed to load digest manifest from {self.path}")
+                traceback.print_exc()
+
+    def digest(self, entry: dict, git_path: str, blob_sha: str | None, filters_key: str) -> str:
+        ''' :param blob_sha: the blob the entry was extracted from, if unknown the digest is always computed. '''
+        if blob_sha is None:
+            self.misses += 1
+            return fast_digest(entry, filters_key)
+        values = {k: entry[k] for k in DIGEST_KEYS if k != 'filters' and k in entry}
+        cached = self.__digests.get(git_path, None)
+        if cached and cached[0] == blob_sha and cached[1] == values:
+            self.hits += 1
+            value = cached[2]
+        else:
+            self.misses += 1
+            value = fast_digest(entry, filters_key)
+        self.__seen[git_path] = [blob_sha, values, value]
+        return value
+
+    def save(self):
+        ''' persists the digests seen in this run. '''
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with gzip.open(self.path, 'wt', encoding='utf-8') as f:
+            json.dump({'version': [MANIFEST_VERSION, CACHE_VERSION], 'digests': self.__seen}, f)
+        print(f"Digest manifest for {self.author}: {self.hits} hits, {self.misses} misses")
@@ -1,5 +1,7 @@
 import logging
 from abc import ABC, abstractmethod, ABCMeta
+from collections import OrderedDict
+from typing import NamedTuple
 
 import decimal
 
@@ -10,6 +12,8 @@ ctx.prec = 17
 
 logger = logging.getLogger('iir')
 
+COEFF_CACHE_SIZE = 8192
+
 
 def float_to_str(f):
     """
@@ -19,33 +23,122 @@ def float_to_str(f):
     return format(d1, 'f')
 
 
+def compute_coeffs(filter_type, fs, freq, q, gain) -> tuple[list[float], list[float]]:
+    '''
+    :param filter_type: the Biquad subclass.
+    :return: the normalised (a, b) coefficients, w0 is calculated from the unrounded freq.
+    '''
+    w0 = 2.0 * math.pi * freq / fs
+    alpha = math.sin(w0) / (2.0 * round(float(q), 4))
+    A = 10.0 ** (round(float(gain), 3) / 40.0)
+    return filter_type._compute_coeffs(A, math.cos(w0), alpha)
+
+
+class Coefficients(NamedTuple):
+    a: list[float]
+    b: list[float]
+    # b0, b1, b2, -a1, -a2 as emitted in the catalogue
+    formatted: tuple[str, ...]
+
+
+class CoefficientCache:
+    '''
+    A bounded LRU cache of computed and formatted coefficients, keyed on the values the formulas actually use, i.e. the
+    filter type, fs, the exact freq (w0 is calculated from the unrounded value) and the rounded q and gain.
+    '''
+
+    def __init__(self, maxsize=COEFF_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.__entries: OrderedDict[tuple, Coefficients] = OrderedDict()
+
+    def get(self, filter_types, fs, freqs, qs, gains) -> list[Coefficients]:
+        ''' looks up each row, computing and caching any misses. '''
+        keys = [(t, s, float(f), round(float(q), 4), round(float(g), 3))
+                for t, s, f, q, g in zip(filter_types, fs, freqs, qs, gains)]
+        found = {}
+        for k in keys:
+            if k in found:
+                self.hits += 1
+            elif k in self.__entries:
+                self.hits += 1
+                self.__entries.move_to_end(k)
+                found[k] = self.__entries[k]
+            else:
+                self.misses += 1
+                found[k] = None
+        missing = [k for k, v in found.items() if v is None]
+        if missing:
+            for k in missing:
+                a, b = compute_coeffs(*k)
+                found[k] = self.__entries[k] = Coefficients(a, b, format_coeffs(a, b))
+            while len(self.__entries) > self.maxsize:
+                self.__entries.popitem(last=False)
+        return [found[k] for k in keys]
+
+
+def format_coeffs(a, b) -> tuple[str, ...]:
+    return tuple([f"{float_to_str(x)}" for x in b] + [f"{float_to_str(-x)}" for x in a[1:]])
+
+
+coefficient_cache = CoefficientCache()
+
+
 class Biquad(ABC):
+    ''' slotted as tens of thousands are held in memory, the coefficients are shared with the coefficient cache. '''
+    __slots__ = ('fs', 'gain', 'freq', 'q', 'w0', '__coeffs')
 
-    def __init__(self, fs, freq, q, gain):
+    def __init__(self, fs, freq, q, gain, coeffs=None):
+        '''
+        :param coeffs: the Coefficients for this filter if the caller has already looked them up.
+        '''
         self.fs = fs
         self.gain = round(float(gain), 3)
         self.freq = round(float(freq), 2)
         self.q = round(float(q), 4)
         self.w0 = 2.0 * math.pi * freq / fs
-        self.cos_w0 = math.cos(self.w0)
-        self.sin_w0 = math.sin(self.w0)
-        self.alpha = self.sin_w0 / (2.0 * self.q)
-        self.A = 10.0 ** (self.gain / 40.0)
-        self.a, self.b = self._compute_coeffs()
+        if coeffs is None:
+            coeffs = coefficient_cache.get([self.__class__], [fs], [freq], [q], [gain])[0]
+        self.__coeffs = coeffs
+
+    @property
+    def cos_w0(self):
+        return math.cos(self.w0)
+
+    @property
+    def sin_w0(self):
+        return math.sin(self.w0)
+
+    @property
+    def alpha(self):
+        return self.sin_w0 / (2.0 * self.q)
+
+    @property
+    def A(self):
+        return 10.0 ** (self.gain / 40.0)
+
+    @property
+    def a(self):
+        return self.__coeffs.a
+
+    @property
+    def b(self):
+        return self.__coeffs.b
 
     def __len__(self):
         return 1
 
+    @staticmethod
     @abstractmethod
-    def _compute_coeffs(self):
+    def _compute_coeffs(A, cos_w0, alpha):
         pass
 
     def format_biquads(self):
-        a = [f"{float_to_str(-x)}" for idx, x in enumerate(self.a) if idx != 0]
-        b = [f"{float_to_str(x)}" for idx, x in enumerate(self.b)]
-        return b + a
+        return list(self.__coeffs.formatted)
 
     def to_map(self):
+        formatted = self.__coeffs.formatted
         return {
             'type': self.__class__.__name__,
             'freq': self.freq,
@@ -53,14 +146,14 @@ class Biquad(ABC):
             'q': self.q,
             'biquads': {
                 '96000': {
-                    'b': self.format_biquads()[0:3],
-                    'a': self.format_biquads()[3:]
+                    'b': list(formatted[0:3]),
+                    'a': list(formatted[3:])
                 }
             }
         }
 
     def __repr__(self):
-        return f"{self.print_params()}|{'`'.join(self.format_biquads())}"
+        return f"{self.print_params()}|{'`'.join(self.__coeffs.formatted)}"
 
     def print_params(self):
         return f"{self.__class__.__name__}|{self.freq}|{self.gain}|{self.q}"
@@ -77,21 +170,23 @@ class PeakingEQ(Biquad):
             a1 =  -2*cos(w0)
             a2 =   1 - alpha/A
     '''
+    __slots__ = ()
 
-    def __init__(self, fs, freq, q, gain):
-        super().__init__(fs, freq, q, gain)
+    def __init__(self, fs, freq, q, gain, coeffs=None):
+        super().__init__(fs, freq, q, gain, coeffs=coeffs)
 
-    def _compute_coeffs(self):
-        A = self.A
-        a = [1.0 + self.alpha / A, -2.0 * self.cos_w0, 1.0 - self.alpha / A]
-        b = [1.0 + self.alpha * A, -2.0 * self.cos_w0, 1.0 - self.alpha * A]
+    @staticmethod
+    def _compute_coeffs(A, cos_w0, alpha):
+        a = [1.0 + alpha / A, -2.0 * cos_w0, 1.0 - alpha / A]
+        b = [1.0 + alpha * A, -2.0 * cos_w0, 1.0 - alpha * A]
         return [a1 / a[0] for a1 in a], [b1 / a[0] for b1 in b]
 
 
 class Shelf(Biquad, metaclass=ABCMeta):
+    __slots__ = ('count',)
 
-    def __init__(self, fs, freq, q, gain, count):
-        super().__init__(fs, freq, q, gain)
+    def __init__(self, fs, freq, q, gain, count, coeffs=None):
+        super().__init__(fs, freq, q, gain, coeffs=coeffs)
         self.count = count
 
     def __len__(self):
@@ -115,21 +210,22 @@ class LowShelf(Shelf):
             a1 =   -2*( (A-1) + (A+1)*cos(w0)                   )
             a2 =        (A+1) + (A-1)*cos(w0) - 2*sqrt(A)*alpha
     '''
+    __slots__ = ()
 
-    def __init__(self, fs, freq, q, gain, count=1):
-        super().__init__(fs, freq, q, gain, count)
+    def __init__(self, fs, freq, q, gain, count=1, coeffs=None):
+        super().__init__(fs, freq, q, gain, count, coeffs=coeffs)
 
-    def _compute_coeffs(self):
-        A = self.A
+    @staticmethod
+    def _compute_coeffs(A, cos_w0, alpha):
         a = [
-            (A + 1) + ((A - 1) * self.cos_w0) + (2.0 * math.sqrt(A) * self.alpha),
-            -2.0 * ((A - 1) + ((A + 1) * self.cos_w0)),
-            (A + 1) + ((A - 1) * self.cos_w0) - (2.0 * math.sqrt(A) * self.alpha)
+            (A + 1) + ((A - 1) * cos_w0) + (2.0 * math.sqrt(A) * alpha),
+            -2.0 * ((A - 1) + ((A + 1) * cos_w0)),
+            (A + 1) + ((A - 1) * cos_w0) - (2.0 * math.sqrt(A) * alpha)
         ]
         b = [
-            A * ((A + 1) - ((A - 1) * self.cos_w0) + (2.0 * math.sqrt(A) * self.alpha)),
-            2.0 * A * ((A - 1) - ((A + 1) * self.cos_w0)),
-            A * ((A + 1) - ((A - 1) * self.cos_w0) - (2 * math.sqrt(A) * self.alpha))
+            A * ((A + 1) - ((A - 1) * cos_w0) + (2.0 * math.sqrt(A) * alpha)),
+            2.0 * A * ((A - 1) - ((A + 1) * cos_w0)),
+            A * ((A + 1) - ((A - 1) * cos_w0) - (2 * math.sqrt(A) * alpha))
         ]
         return [a1 / a[0] for a1 in a], [b1 / a[0] for b1 in b]
 
@@ -146,14 +242,13 @@ class HighShelf(Shelf):
                 a2 =        (A+1) - (A-1)*cos(w0) - 2*sqrt(A)*alpha
 
     '''
+    __slots__ = ()
 
-    def __init__(self, fs, freq, q, gain, count=1):
-        super().__init__(fs, freq, q, gain, count)
+    def __init__(self, fs, freq, q, gain, count=1, coeffs=None):
+        super().__init__(fs, freq, q, gain, count, coeffs=coeffs)
 
-    def _compute_coeffs(self):
-        A = self.A
-        cos_w0 = self.cos_w0
-        alpha = self.alpha
+    @staticmethod
+    def _compute_coeffs(A, cos_w0, alpha):
         a = [
             (A + 1) - ((A - 1) * cos_w0) + (2.0 * math.sqrt(A) * alpha),
             2.0 * ((A - 1) - ((A + 1) * cos_w0)),
@@ -167,13 +262,13 @@ class HighShelf(Shelf):
         return [a1 / a[0] for a1 in a], [b1 / a[0] for b1 in b]
 
 
-def __extract_filters(file):
+def __extract_filters(file, root=None):
     import xml.etree.ElementTree as ET
     from collections import Counter
 
     ignore_vals = ['hex', 'dec']
-    tree = ET.parse(file)
-    root = tree.getroot()
+    if root is None:
+        root = ET.parse(file).getroot()
     filts = {}
     for child in root:
         if child.tag == 'filter':
@@ -221,26 +316,34 @@ def __extract_filters(file):
     return Counter([tuple(f.items()) for f in final_filt])
 
 
-def xml_to_filt(file, fs=96000, unroll=False) -> list[Biquad]:
-    ''' Extracts a set of filters from the provided minidsp file '''
-    filts = __extract_filters(file)
-    output = []
+def xml_to_filt(file, fs=96000, unroll=False, root=None) -> list[Biquad]:
+    '''
+    Extracts a set of filters from the provided minidsp file, if the caller has already parsed the file then the root
+    element (or any iterable of its children) can be supplied and the file is only used in error messages.
+    '''
+    filts = __extract_filters(file, root=root)
+    rows = []
     for filt_tup, count in filts.items():
         filt_dict = dict(filt_tup)
         if filt_dict['type'] == 'SL':
-            for i in range(0, count if unroll is True else 1):
-                filt = LowShelf(fs, float(filt_dict['freq']), float(filt_dict['q']), float(filt_dict['boost']),
-                                count=1 if unroll is True else count)
-                output.append(filt)
+            rows.append((LowShelf, filt_dict, count))
         elif filt_dict['type'] == 'SH':
-            for i in range(0, count if unroll is True else 1):
-                filt = HighShelf(fs, float(filt_dict['freq']), float(filt_dict['q']), float(filt_dict['boost']),
-                                 count=1 if unroll is True else count)
-                output.append(filt)
+            rows.append((HighShelf, filt_dict, count))
         elif filt_dict['type'] == 'PK':
-            for i in range(0, count):
-                filt = PeakingEQ(fs, float(filt_dict['freq']), float(filt_dict['q']), float(filt_dict['boost']))
-                output.append(filt)
+            rows.append((PeakingEQ, filt_dict, count))
         else:
             logger.info(f"Ignoring unknown filter type {filt_dict}")
+    freqs = [float(r[1]['freq']) for r in rows]
+    qs = [float(r[1]['q']) for r in rows]
+    gains = [float(r[1]['boost']) for r in rows]
+    coeffs = coefficient_cache.get([r[0] for r in rows], [fs] * len(rows), freqs, qs, gains)
+    output = []
+    # filters are never mutated so repeated (e.g. unrolled stacked shelf) filters share a single instance
+    for (filt_type, _, count), freq, q, gain, c in zip(rows, freqs, qs, gains, coeffs):
+        if filt_type is PeakingEQ:
+            output.extend([PeakingEQ(fs, freq, q, gain, coeffs=c)] * count)
+        elif unroll is True:
+            output.extend([filt_type(fs, freq, q, gain, count=1, coeffs=c)] * count)
+        else:
+            output.append(filt_type(fs, freq, q, gain, count=count, coeffs=c))
     return output
@@ -0,0 +1,148 @@
+'''
+Collects the author repositories listed in repos.py ready for a build.
+
+Each repository is cloned into its directory under .input, or updated if it is already there, and then
+
+    meta/<author>.diff : "<path>",<time> for each catalogued file which was added or modified since the commit in
+                         meta/<author>.sha, or every catalogued file after a fresh clone, sorted. The time is the author
+                         time of the last commit to touch the file.
+    meta/<author>.sha  : the commit at HEAD
+
+With --bare the repositories are cloned without a working tree, the build then reads the files from the object store.
+Repositories are collected concurrently and the times for a repository come from a single git log rather than one per
+changed file. --remote-base replaces https://github.com so a set of local (e.g. bare) repositories laid out as
+<base>/<owner>/<name>.git can be collected without network access.
+'''
+import argparse
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator
+
+from repos import DEFAULT_PATHSPECS, REPO_CONFIGS, REPO_PATHSPECS, REPO_REMOTES
+
+REMOTE_BASE = 'https://github.com'
+# the log header of each commit, \x01 cannot appear in a path
+COMMIT_MARKER = b'\x01'
+
+
+def git(repo: str, *args: str) -> bytes:
+    return subprocess.run(['git', '-C', repo, *args], check=True, stdout=subprocess.PIPE).stdout
+
+
+def fetch(url: str, repo: str, bare: bool = False) -> bool:
+    '''
+    clones the repository, or updates it if already present, a failed update leaves the existing repository in place.
+    :param bare: clone without a working tree, the build must then read the files with --git-objects.
+    :return: true if the repository was already present.
+    '''
+    if os.path.isdir(repo):
+        if git(repo, 'rev-parse', '--is-bare-repository').strip() == b'true':
+            update = ['fetch', '-q', '--prune', url, '+refs/heads/*:refs/heads/*']
+        else:
+            update = ['pull', '-q']
+        if subprocess.run(['git', '-C', repo, *update]).returncode != 0:
+            print(f"Failed to update {repo} from {url}")
+        return True
+    subprocess.run(['git', 'clone', '-q', *(['--bare'] if bare else []), url, repo], check=True)
+    return False
+
+
+def changed_paths(repo: str, since: str | None, pathspecs: list[str]) -> list[bytes]:
+    '''
+    :return: the paths which differ between since, or the empty tree if there is none, and HEAD. Deleted paths are
+    excluded.
+    '''
+    if not since:
+        since = git(repo, 'hash-object', '-t', 'tree', os.devnull).decode('utf-8').strip()
+    diff = git(repo, 'diff', '--name-only', '-z', '--diff-filter=d', f"{since}..HEAD", '--', *pathspecs)
+    return [p for p in diff.split(b'\0') if p]
+
+
+def log_entries(repo: str, pathspecs: list[str]) -> Iterator[tuple[int, bytes]]:
+    '''
+    streams the history of HEAD, newest first.
+    :return: (author time, path) for each path touched by each commit, merges only report paths which differ from
+    every parent as git log -1 <path> would.
+    '''
+    proc = subprocess.Popen(['git', '-C', repo, 'log', '-z', '--name-only', '--no-renames', '-c',
+                             "--format=%x01%at", 'HEAD', '--', *pathspecs], stdout=subprocess.PIPE)
+    try:
+        committed_at = None
+        pending = b''
+        while True:
+            chunk = proc.stdout.read(65536)
+            tokens = (pending + chunk).split(b'\0')
+            pending = tokens.pop() if chunk else b''
+            for token in tokens:
+                if token.startswith(COMMIT_MARKER):
+                    committed_at = int(token[1:])
+                else:
+                    token = token.lstrip(b'\n')
+                    if token:
+                        yield committed_at, token
+            if not chunk:
+                break
+    finally:
+        proc.stdout.close()
+        proc.kill()
+        proc.wait()
+
+
+def last_modified(repo: str, paths: list[bytes], pathspecs: list[str]) -> dict[bytes, int]:
+    ''' :return: the time of the last commit to touch each path, the log is only read until every path is found. '''
+    remaining = set(paths)
+    times = {}
+    if remaining:
+        for committed_at, path in log_entries(repo, pathspecs):
+            if path in remaining:
+                times[path] = committed_at
+                remaining.remove(path)
+                if not remaining:
+                    break
+    return times
+
+
+def collect(author: str, repo: str, url: str, pathspecs: list[str], bare: bool = False) -> int:
+    ''' :return: the number of changed files. '''
+    print(f"Processing {author}")
+    sha_file = f"meta/{author}.sha"
+    since = None
+    if fetch(url, repo, bare) and os.path.isfile(sha_file):
+        with open(sha_file) as f:
+            since = f.read().strip()
+    paths = changed_paths(repo, since, pathspecs)
+    times = last_modified(repo, paths, pathspecs)
+    lines = sorted(b'"' + p + b'",' + str(times[p]).encode('utf-8') for p in paths if p in times)
+    with open(f"meta/{author}.diff", 'wb') as f:
+        f.writelines(line + b'\n' for line in lines)
+    with open(sha_file, 'wb') as f:
+        f.write(git(repo, 'rev-parse', 'HEAD'))
+    print(f"Processed {author}, {len(lines)} changed files")
+    return len(lines)
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Clones or updates the author repositories and lists the files '
+                                                     'which have changed since the last run')
+    arg_parser.add_argument('--remote-base', default=REMOTE_BASE,
+                            help='url or path containing <owner>/<name>.git for each author repository')
+    arg_parser.add_argument('--bare', action='store_true',
+                            help='clone new repositories without a working tree, build with --git-objects to read them')
+    arg_parser.add_argument('--authors', nargs='+', help='only collect these authors')
+    arg_parser.add_argument('--workers', type=int, default=len(REPO_CONFIGS),
+                            help='number of repositories to collect at once')
+    args = arg_parser.parse_args()
+
+    os.makedirs('meta', exist_ok=True)
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = []
+        for author, repo_path, _, _ in REPO_CONFIGS:
+            if args.authors and author not in args.authors:
+                continue
+            owner, name = REPO_REMOTES[author]
+            futures.append(executor.submit(collect, author, repo_path.rstrip('/'),
+                                           f"{args.remote_base}/{owner}/{name}.git",
+                                           REPO_PATHSPECS.get(author, DEFAULT_PATHSPECS), args.bare))
+        for future in futures:
+            future.result()
@@ -0,0 +1,105 @@
+'''
+Records how long each stage of the build takes so that a slow stage, or a slow author repository, can be identified.
+
+The report is written to .cache/build.json, outside of meta/ as the timings change on every run, and contains
+
+    * the wall and cpu time of each stage, stages may be labelled (e.g. with the author) and may nest
+    * a histogram of the time taken to extract each file, by author and content type
+    * the peak resident set size of this process and of the extraction worker processes
+
+cpu time is that of the main process only, time spent in worker processes shows up as wall time in the stage which
+waits for them.
+'''
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from cache import CACHE_DIR
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# upper bounds, in ms, of the parse latency histogram buckets, anything slower is counted in a final bucket
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000]
+
+
+def summarise_latencies(latencies: list[float]) -> dict:
+    ''' :param latencies: durations in seconds. '''
+    ordered = sorted(latencies)
+    counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+    for latency in ordered:
+        ms = latency * 1000
+        counts[next((i for i, b in enumerate(LATENCY_BUCKETS_MS) if ms <= b), len(LATENCY_BUCKETS_MS))] += 1
+
+    def percentile(p):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000, 3)
+
+    return {
+        'count': len(ordered),
+        'total_ms': round(sum(ordered) * 1000, 3),
+        'p50_ms': percentile(0.5),
+        'p95_ms': percentile(0.95),
+        'max_ms': round(ordered[-1] * 1000, 3),
+        'buckets': {**{f"<={b}ms": c for b, c in zip(LATENCY_BUCKETS_MS, counts)},
+                    f">{LATENCY_BUCKETS_MS[-1]}ms": counts[-1]}
+    }
+
+
+def peak_rss_kib() -> dict[str, int] | None:
+    if resource is None:
+        return None
+    # ru_maxrss is in KiB on linux but bytes on macOS
+    scale = 1024 if sys.platform == 'darwin' else 1
+    return {
+        'self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale,
+        'children': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale
+    }
+
+
+class BuildReport:
+
+    def __init__(self):
+        self.started_at = int(time.time())
+        self.__wall = time.perf_counter()
+        self.__cpu = time.process_time()
+        self.__stages: list[dict] = []
+        self.__latencies: dict[str, list[float]] = defaultdict(list)
+
+    @contextmanager
+    def stage(self, name: str, **labels):
+        ''' times the enclosed block, stages are reported in the order they started. '''
+        record = {'stage': name, **labels}
+        self.__stages.append(record)
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            record['wall'] = round(time.perf_counter() - wall, 4)
+            record['cpu'] = round(time.process_time() - cpu, 4)
+
+    def add_latency(self, group: str, seconds: float):
+        self.__latencies[group].append(seconds)
+
+    def save(self, path: str = f"{CACHE_DIR}/build.json"):
+        report = {
+            'started_at': self.started_at,
+            'wall': round(time.perf_counter() - self.__wall, 4),
+            'cpu': round(time.process_time() - self.__cpu, 4),
+            'peak_rss_kib': peak_rss_kib(),
+            'stages': self.__stages,
+            'parse_latency': {k: summarise_latencies(v) for k, v in sorted(self.__latencies.items())}
+        }
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=0)
+        slowest = sorted(self.__stages, key=lambda s: s.get('wall', 0), reverse=True)[:5]
+        described = [f"{' '.join(str(v) for k, v in s.items() if k not in ('wall', 'cpu'))} {s['wall']:.2f}s"
+                     for s in slowest]
+        print(f"Build took {report['wall']:.2f}s, slowest stages: {', '.join(described)}")
+        print(f"Build report written to {path}")
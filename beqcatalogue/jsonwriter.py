@@ -0,0 +1,108 @@
+'''
+Writes a json array one entry at a time so the catalogue never has to be held in memory in order to serialise it.
+
+By default the output is byte for byte what json.dump(entries, f, indent=0) produces, the compact form drops all
+whitespace and sorts keys. A gzip sibling (<path>.gz) can be written alongside for clients which accept a precompressed
+copy, it is written with a fixed mtime so it only changes when the json does.
+'''
+import gzip
+import hashlib
+import json
+import os
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class JsonArrayWriter:
+    '''
+    Streams entries into a json array, the output is written to a temporary file and moved into place on close so
+    readers never see a partial file and the previous file can still be read while the new one is written. If the
+    content is unchanged the existing file is kept as is.
+    '''
+
+    def __init__(self, path: str, compact: bool = False, compress: bool = False):
+        self.path = path
+        self.count = 0
+        self.offset = 0
+        self.changed = True
+        self.__sha = hashlib.sha256()
+        self.__compact = compact
+        self.__tmp_paths = [f"{path}.tmp"]
+        self.__f = open(self.__tmp_paths[0], 'w', encoding='utf-8')
+        self.__gz_f = None
+        self.__gz = None
+        if compress:
+            self.__tmp_paths.append(f"{path}.gz.tmp")
+            self.__gz_f = open(self.__tmp_paths[1], 'wb')
+            self.__gz = gzip.GzipFile(filename='', mode='wb', compresslevel=9, mtime=0, fileobj=self.__gz_f)
+
+    def __emit(self, text: str):
+        self.__f.write(text)
+        self.__sha.update(text.encode('utf-8'))
+        # json.dumps escapes any non ascii characters so the length is also the number of bytes written
+        self.offset += len(text)
+        if self.__gz:
+            self.__gz.write(text.encode('utf-8'))
+
+    def encode(self, entry: dict) -> str:
+        if self.__compact:
+            return json.dumps(entry, separators=(',', ':'), sort_keys=True)
+        return json.dumps(entry, indent=0)
+
+    def write(self, entry: dict, encoded: str | None = None) -> tuple[int, int]:
+        '''
+        :param encoded: the entry as already encoded by a writer in the same mode, saves encoding it again.
+        :return: the byte range of the entry in the file.
+        '''
+        text = encoded if encoded is not None else self.encode(entry)
+        if self.__compact:
+            self.__emit(f",{text}" if self.count else f"[{text}")
+        else:
+            self.__emit(f",\n{text}" if self.count else f"[\n{text}")
+        self.count += 1
+        return self.offset - len(text), self.offset
+
+    def __close_files(self):
+        self.__f.close()
+        if self.__gz:
+            self.__gz.close()
+            self.__gz_f.close()
+
+    def close(self):
+        if not self.count:
+            self.__emit('[]')
+        else:
+            self.__emit(']' if self.__compact else '\n]')
+        self.__close_files()
+        self.changed = not os.path.isfile(self.path) or file_sha256(self.path) != self.sha256
+        for tmp in self.__tmp_paths:
+            if self.changed or not os.path.isfile(tmp[:-4]):
+                os.replace(tmp, tmp[:-4])
+            else:
+                os.remove(tmp)
+
+    @property
+    def sha256(self) -> str:
+        ''' the hash of the content written so far. '''
+        return self.__sha.hexdigest()
+
+    def abort(self):
+        ''' discards the output, any existing file is left untouched. '''
+        self.__close_files()
+        for tmp in self.__tmp_paths:
+            os.remove(tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -0,0 +1,44 @@
+import xml.etree.ElementTree as ET
+from typing import NamedTuple
+
+
+class MiniDSPFile(NamedTuple):
+    ''' the parts of a minidsp file the catalogue uses, elements are detached from the (discarded) document root '''
+    metadata: list[ET.Element]
+    filters: list[ET.Element]
+
+
+def is_peq_filter(elem: ET.Element) -> bool:
+    '''
+    :return: true if this is a filter element that xml_to_filt will consider, any filter name that does not split
+    into exactly 3 tokens is retained so that it fails in the same way as a full parse.
+    '''
+    if elem.tag != 'filter' or 'name' not in elem.attrib:
+        return False
+    tokens = elem.attrib['name'].split('_')
+    return len(tokens) != 3 or tokens[0] == 'PEQ'
+
+
+def read_minidsp(file) -> MiniDSPFile:
+    '''
+    Streams the file with iterparse, keeping only the beq_metadata and PEQ filter elements. Every other child of the
+    root is dropped as soon as it has been parsed so the full tree is never held in memory.
+    '''
+    metadata = []
+    filters = []
+    root = None
+    depth = 0
+    for event, elem in ET.iterparse(file, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = elem
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 1:
+                if elem.tag == 'beq_metadata':
+                    metadata.append(elem)
+                elif is_peq_filter(elem):
+                    filters.append(elem)
+                del root[:]
+    return MiniDSPFile(metadata, filters)
@@ -0,0 +1,109 @@
+'''
+Records where each author's entries are in the catalogue files so the entries retained from a previous run can be read
+back without parsing the rest of the file.
+
+The index for docs/<name> is written to meta/<name>.idx, it holds the size of the data file and a list of runs in file
+order, each run being a contiguous range of bytes holding entries from a single author along with the sha256 of those
+bytes. Runs are capped at MAX_RUN_ENTRIES entries so a run can be read back without holding much of the file in
+memory. The index is only trusted if the size and the hash of every run which is read back still match.
+'''
+import csv
+import hashlib
+import json
+import os
+import traceback
+from typing import BinaryIO, Iterator
+
+INDEX_VERSION = 1
+MAX_RUN_ENTRIES = 1000
+
+
+def index_path(data_path: str) -> str:
+    return f"meta/{os.path.basename(data_path)}.idx"
+
+
+class OffsetIndex:
+
+    def __init__(self, data_path: str):
+        self.data_path = data_path
+        self.__runs: list[list] = []
+        self.__run_entries = 0
+
+    def add(self, author: str, start: int, end: int):
+        ''' records an entry written to [start, end), consecutive entries by the same author are merged into one run. '''
+        if self.__runs and self.__runs[-1][0] == author and self.__run_entries < MAX_RUN_ENTRIES:
+            self.__runs[-1][2] = end
+            self.__run_entries += 1
+        else:
+            self.__runs.append([author, start, end])
+            self.__run_entries = 1
+
+    def save(self):
+        ''' hashes each run in the completed data file and writes the index. '''
+        runs = []
+        with open(self.data_path, 'rb') as f:
+            for author, start, end in self.__runs:
+                f.seek(start)
+                runs.append([author, start, end, hashlib.sha256(f.read(end - start)).hexdigest()])
+        os.makedirs('meta', exist_ok=True)
+        with open(index_path(self.data_path), 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'size': os.path.getsize(self.data_path), 'runs': runs}, f)
+
+
+def read_runs(data_path: str, authors: list[str]) -> Iterator[bytes] | None:
+    '''
+    every run is checked before any is returned so the caller never sees part of an outdated file.
+    :return: an iterator over the bytes of every run owned by one of the authors in file order, None if there is no
+    usable index.
+    '''
+    idx_path = index_path(data_path)
+    if not os.path.isfile(idx_path) or not os.path.isfile(data_path):
+        return None
+    try:
+        with open(idx_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('version', None) != INDEX_VERSION or index['size'] != os.path.getsize(data_path):
+            print(f"Ignoring outdated index {idx_path}")
+            return None
+        runs = [(start, end) for author, start, end, sha in index['runs'] if author in authors]
+        with open(data_path, 'rb') as f:
+            for author, start, end, sha in index['runs']:
+                if author in authors:
+                    f.seek(start)
+                    if hashlib.sha256(f.read(end - start)).hexdigest() != sha:
+                        print(f"Ignoring index {idx_path} as {data_path} has changed")
+                        return None
+        return __iter_runs(data_path, runs)
+    except Exception:
+        print(f"Failed to read index {idx_path}")
+        traceback.print_exc()
+        return None
+
+
+def __iter_runs(data_path: str, runs: list[tuple[int, int]]) -> Iterator[bytes]:
+    with open(data_path, 'rb') as f:
+        for start, end in runs:
+            f.seek(start)
+            yield f.read(end - start)
+
+
+class IndexedCsvWriter:
+    ''' a csv writer which encodes rows as utf-8 and indexes each one by the author held in the 4th column. '''
+
+    def __init__(self, f: BinaryIO, index: OffsetIndex):
+        self.__f = f
+        self.__index = index
+        self.__offset = 0
+        self.__writer = csv.writer(self)
+        self.rows = 0
+
+    def write(self, text: str):
+        data = text.encode('utf-8')
+        self.__f.write(data)
+        self.__offset += len(data)
+
+    def writerow(self, row: list[str]):
+        start = self.__offset
+        self.__writer.writerow(row)
+        self.__index.add(row[3], start, self.__offset)
+        self.rows += 1
@@ -0,0 +1,87 @@
+import hashlib
+import json
+import os
+import traceback
+
+from cache import CACHE_DIR
+
+
+class PageWriter:
+    '''
+    Writes generated pages only when their content has changed so mtimes (and mkdocs dirty builds) reflect real changes.
+    The hash, size and mtime of every page is recorded in a manifest so unchanged pages are detected without reading
+    them back. Pages in the manifest which are not generated in this run are deleted, any page the writer did not
+    create itself is left alone. Nothing is deleted from a directory in which no page was generated, e.g. if an author
+    repository is missing, nor beneath a path passed to keep, such pages stay in the manifest for the next run.
+    '''
+
+    def __init__(self, manifest_path: str = f"{CACHE_DIR}/pages.json"):
+        self.manifest_path = manifest_path
+        self.written = 0
+        self.unchanged = 0
+        self.deleted = 0
+        self.__previous: dict[str, dict] = {}
+        self.__current: dict[str, dict] = {}
+        self.__kept: list[str] = []
+        if os.path.isfile(manifest_path):
+            try:
+                with open(manifest_path, 'r', encoding='utf-8') as f:
+                    self.__previous = json.load(f)
+            except Exception:
+                print(f"Failed to load page manifest from {manifest_path}")
+                traceback.print_exc()
+
+    def __existing_sha(self, path: str) -> str | None:
+        if not os.path.isfile(path):
+            return None
+        st = os.stat(path)
+        entry = self.__previous.get(path, None)
+        if entry and entry['size'] == st.st_size and entry['mtime'] == st.st_mtime_ns:
+            return entry['sha']
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+
+    def __record(self, path: str, sha: str):
+        st = os.stat(path)
+        self.__current[path] = {'sha': sha, 'size': st.st_size, 'mtime': st.st_mtime_ns}
+
+    def write(self, path: str, content: str) -> bool:
+        ''' :return: true if the page was written. '''
+        data = content.encode('utf-8')
+        sha = hashlib.sha256(data).hexdigest()
+        if self.__existing_sha(path) == sha:
+            self.unchanged += 1
+            self.__record(path, sha)
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        self.written += 1
+        self.__record(path, sha)
+        return True
+
+    def keep(self, prefix: str):
+        ''' leaves any page from the previous run whose path starts with prefix in place. '''
+        self.__kept.append(prefix)
+
+    def finish(self):
+        ''' deletes pages from the previous run which were not generated this time and saves the manifest. '''
+        generated_dirs = {os.path.dirname(p) for p in self.__current.keys()}
+        kept = 0
+        for path, entry in self.__previous.items():
+            if path in self.__current:
+                continue
+            if os.path.dirname(path) not in generated_dirs or any(path.startswith(k) for k in self.__kept):
+                if os.path.isfile(path):
+                    self.__current[path] = entry
+                    kept += 1
+            elif self.__existing_sha(path) == entry['sha']:
+                print(f"Deleting {path}")
+                os.remove(path)
+                self.deleted += 1
+        if kept:
+            print(f"Kept {kept} pages which were not generated")
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        with open(self.manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(self.__current, f)
+        print(f"Pages: {self.written} written, {self.unchanged} unchanged, {self.deleted} deleted")
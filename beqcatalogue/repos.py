@@ -0,0 +1,25 @@
+# author, local checkout of the author's repository, film dir, TV dir
+REPO_CONFIGS = [
+    ('halcyon888', '.input/halcyon888/miniDSPBEQ/', 'Movie BEQs', 'TV Shows BEQ'),
+    ('t1g8rsfan', '.input/t1g8rsfan/miniDSPBEQ/', 'Movie BEQs', 'TV Shows BEQ'),
+    ('kaelaria', '.input/kaelaria/Beq1/', 'movies', 'tv'),
+    ('remixmark', '.input/remixmark/miniDSPBEQ/', 'Movie BEQs', 'TV BEQs'),
+    ('mikejl', '.input/mikejl/xml/', 'Movies', 'TV'),
+    ('bombaycat007', '.input/bombaycat007/miniDSPBEQ/', 'Movie BEQs', 'TV BEQS')
+]
+# authors whose entries are no longer generated from a repository but are carried over from the previous catalogue
+RETAINED_AUTHORS = ['aron7awol', 'mobe1969']
+# author -> github owner and name of the author's repository
+REPO_REMOTES = {
+    'halcyon888': ('halcyon-888', 'miniDSPBEQ'),
+    't1g8rsfan': ('T1G8RS-FAN', 'MiniDSPBEQ'),
+    'kaelaria': ('kaelaria', 'Beq1'),
+    'remixmark': ('remixmark', 'miniDSPBEQ'),
+    'mikejl': ('MikejLarson', 'xml'),
+    'bombaycat007': ('BombayCat007', 'miniDSPBEQ')
+}
+# git pathspecs of the files in an author's repository which are catalogued
+DEFAULT_PATHSPECS = ['*BEQ*']
+REPO_PATHSPECS = {
+    'kaelaria': ['tv/', 'movies/']
+}
@@ -0,0 +1,151 @@
+'''
+Computes the combined magnitude response of each catalogue entry's filters on a fixed log spaced grid.
+
+The responses are written to a binary sidecar alongside database.json, all values are little endian:
+
+    header  : magic b'BEQR', uint16 version, uint16 points, uint16 scale, uint32 entries
+    freqs   : float32 * points
+    entries : (32 byte sha256 digest, int16 * points) * entries, sorted by digest
+
+each response value is the gain in dB multiplied by scale.
+'''
+import array
+import math
+import os
+import struct
+import sys
+import traceback
+from collections import OrderedDict
+
+FS = 96000
+MIN_FREQ = 1.0
+MAX_FREQ = 200.0
+POINTS = 96
+SCALE = 100
+MAGIC = b'BEQR'
+VERSION = 1
+HEADER = struct.Struct('<4sHHHI')
+FILTER_CACHE_SIZE = 8192
+
+
+def log_spaced(start: float, end: float, points: int) -> list[float]:
+    step = math.log(end / start) / (points - 1)
+    return [start * math.exp(step * i) for i in range(points)]
+
+
+FREQS = log_spaced(MIN_FREQ, MAX_FREQ, POINTS)
+# sin^2(w/2) at each grid point, this form avoids the cancellation in cos(w) based formulas at very low frequencies
+PHI = [math.sin(math.pi * f / FS) ** 2 for f in FREQS]
+
+
+def biquad_response(b: list[float], a: list[float]) -> list[float]:
+    '''
+    :param b: b0, b1, b2.
+    :param a: a0, a1, a2.
+    :return: the magnitude response in dB at each grid point.
+    '''
+    def terms(c):
+        return (c[0] + c[1] + c[2]) ** 2, -4.0 * (c[0] * c[1] + 4.0 * c[0] * c[2] + c[1] * c[2]), 16.0 * c[0] * c[2]
+
+    n0, n1, n2 = terms(b)
+    d0, d1, d2 = terms(a)
+    return [10.0 * math.log10(max(n0 + (n1 + n2 * p) * p, 1e-30) / max(d0 + (d1 + d2 * p) * p, 1e-30)) for p in PHI]
+
+
+def to_bytes(values: array.array) -> bytes:
+    if sys.byteorder != 'little':
+        values = array.array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def from_bytes(typecode: str, data: bytes) -> array.array:
+    values = array.array(typecode, data)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+def load_responses(path: str) -> dict[str, array.array]:
+    ''' :return: the quantised response by digest, empty if the file is missing or was written with another grid. '''
+    responses = {}
+    if os.path.isfile(path):
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            magic, version, points, scale, count = HEADER.unpack_from(data)
+            if magic == MAGIC and version == VERSION and points == POINTS and scale == SCALE:
+                offset = HEADER.size + 4 * points
+                row_size = 32 + 2 * points
+                for i in range(count):
+                    row = offset + i * row_size
+                    responses[data[row:row + 32].hex()] = from_bytes('h', data[row + 32:row + row_size])
+            else:
+                print(f"Ignoring responses in {path} as they were generated with a different grid")
+        except Exception:
+            print(f"Failed to load responses from {path}")
+            traceback.print_exc()
+    return responses
+
+
+class ResponseCache:
+    '''
+    Calculates the combined response of each entry, responses from the previous run are reused for any digest which
+    is still present. Individual filter responses are held in a bounded LRU cache as the same filters recur across
+    many entries.
+    '''
+
+    def __init__(self, path: str = 'docs/responses.bin'):
+        self.path = path
+        self.computed = 0
+        self.reused = 0
+        self.__previous = load_responses(path)
+        self.__responses: dict[str, array.array] = {}
+        self.__filters: OrderedDict[tuple, array.array] = OrderedDict()
+
+    def add(self, digest: str, filters: list[dict]):
+        if digest in self.__responses:
+            return
+        if digest in self.__previous:
+            self.reused += 1
+            self.__responses[digest] = self.__previous[digest]
+        else:
+            self.computed += 1
+            self.__responses[digest] = self.__quantise(self.__compute(filters))
+
+    def __compute(self, filters: list[dict]) -> list[float]:
+        total = [0.0] * POINTS
+        for f in filters:
+            coeffs = f['biquads'][str(FS)]
+            key = (*coeffs['b'], *coeffs['a'])
+            response = self.__filters.get(key, None)
+            if response is None:
+                # the catalogue stores -a1, -a2 with a0 normalised to 1
+                b = [float(x) for x in coeffs['b']]
+                a = [1.0] + [-float(x) for x in coeffs['a']]
+                response = self.__filters[key] = array.array('d', biquad_response(b, a))
+                if len(self.__filters) > FILTER_CACHE_SIZE:
+                    self.__filters.popitem(last=False)
+            else:
+                self.__filters.move_to_end(key)
+            count = f.get('count', 1)
+            total = [t + r * count for t, r in zip(total, response)]
+        return total
+
+    @staticmethod
+    def __quantise(response: list[float]) -> array.array:
+        return array.array('h', [max(-32768, min(32767, round(r * SCALE))) for r in response])
+
+    def get(self, digest: str) -> list[float] | None:
+        response = self.__responses.get(digest, None)
+        return [r / SCALE for r in response] if response is not None else None
+
+    def save(self):
+        digests = sorted(self.__responses.keys())
+        with open(self.path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, POINTS, SCALE, len(digests)))
+            f.write(to_bytes(array.array('f', FREQS)))
+            for d in digests:
+                f.write(bytes.fromhex(d))
+                f.write(to_bytes(self.__responses[d]))
+        print(f"Wrote {len(digests)} responses to {self.path}, {self.computed} computed, {self.reused} reused")
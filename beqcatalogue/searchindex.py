@@ -0,0 +1,90 @@
+'''
+Builds an inverted index over the catalogue which the site can fetch piecemeal rather than downloading the whole
+database before filtering.
+
+Every entry is a document whose id is its position in database.json. The index is written to docs/searchindex as
+
+    manifest.json      : {'version', 'docs', 'chunk_size', 'doc_fields', 'title_shards': [prefix], 'fields': [name]}
+    docs/<n>.json      : the display fields of documents n * chunk_size to (n + 1) * chunk_size - 1
+    title/<prefix>.json: {token: postings} for every title token starting with prefix
+    <field>.json       : {value: postings} for each of the keyword fields
+
+postings are the sorted document ids delta encoded, i.e. each value is the difference from the one before. Title
+tokens are casefolded with diacritics removed and sharded by their first 2 characters, a query loads the shard for
+each token it contains.
+'''
+import json
+import re
+import unicodedata
+from collections import defaultdict
+
+from pages import PageWriter
+
+VERSION = 1
+OUTPUT_DIR = 'docs/searchindex'
+CHUNK_SIZE = 1000
+PREFIX_LENGTH = 2
+DOC_FIELDS = ['title', 'year', 'author', 'content_type', 'catalogue_url', 'audioTypes']
+# keyword field -> the entry key it is taken from
+KEYWORD_FIELDS = {'codec': 'audioCodecs', 'channels': 'audioChannelCounts', 'genre': 'genres', 'author': 'author',
+                  'year': 'year'}
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def normalise(text: str) -> str:
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def tokenise(text: str) -> set[str]:
+    return set(TOKEN_PATTERN.findall(normalise(text)))
+
+
+def delta_encode(ids: list[int]) -> list[int]:
+    return [i - p for i, p in zip(ids, [0] + ids[:-1])]
+
+
+def to_json(value) -> str:
+    return json.dumps(value, separators=(',', ':'), sort_keys=True)
+
+
+class SearchIndex:
+
+    def __init__(self):
+        self.__docs: list[list] = []
+        self.__titles: dict[str, list[int]] = defaultdict(list)
+        self.__keywords: dict[str, dict[str, list[int]]] = {f: defaultdict(list) for f in KEYWORD_FIELDS}
+
+    def add(self, entry: dict):
+        doc_id = len(self.__docs)
+        self.__docs.append([entry.get(f, None) for f in DOC_FIELDS])
+        for token in tokenise(entry.get('title', '')):
+            self.__titles[token].append(doc_id)
+        for field, key in KEYWORD_FIELDS.items():
+            values = entry.get(key, [])
+            for value in sorted(set([values] if isinstance(values, str) else values)):
+                if value:
+                    self.__keywords[field][normalise(value)].append(doc_id)
+
+    def save(self, page_writer: PageWriter):
+        ''' writes the index via the page writer so unchanged files are not touched and stale shards are removed. '''
+        chunks = range(0, len(self.__docs), CHUNK_SIZE)
+        for n, start in enumerate(chunks):
+            page_writer.write(f"{OUTPUT_DIR}/docs/{n}.json", to_json(self.__docs[start:start + CHUNK_SIZE]))
+        shards = defaultdict(dict)
+        for token, ids in self.__titles.items():
+            shards[token[:PREFIX_LENGTH]][token] = delta_encode(ids)
+        for prefix, postings in shards.items():
+            page_writer.write(f"{OUTPUT_DIR}/title/{prefix}.json", to_json(postings))
+        for field, values in self.__keywords.items():
+            page_writer.write(f"{OUTPUT_DIR}/{field}.json",
+                              to_json({v: delta_encode(ids) for v, ids in values.items()}))
+        page_writer.write(f"{OUTPUT_DIR}/manifest.json", to_json({
+            'version': VERSION,
+            'docs': len(self.__docs),
+            'chunk_size': CHUNK_SIZE,
+            'doc_fields': DOC_FIELDS,
+            'title_shards': sorted(shards.keys()),
+            'fields': list(KEYWORD_FIELDS.keys())
+        }))
+        print(f"Search index: {len(self.__docs)} docs, {len(self.__titles)} title tokens in {len(shards)} shards")
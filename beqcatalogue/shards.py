@@ -0,0 +1,71 @@
+'''
+Splits the catalogue into per author and per year json files so clients can fetch only the slices they need.
+
+The shards are written to docs/shards/author/<author>.json and docs/shards/year/<year>.json, entries without a 4 digit
+year go to year/unknown.json. docs/shards/manifest.json lists every shard with its entry count, size and sha256 so
+clients can tell which shards have changed without fetching them. Shards whose content is unchanged are not rewritten.
+'''
+import glob
+import json
+import os
+import re
+
+from jsonwriter import JsonArrayWriter
+
+OUTPUT_DIR = 'docs/shards'
+VERSION = 1
+YEAR_PATTERN = re.compile(r'\d{4}')
+
+
+class ShardWriter:
+
+    def __init__(self, output_dir: str = OUTPUT_DIR, compact: bool = False):
+        self.output_dir = output_dir
+        self.__compact = compact
+        self.__writers: dict[str, JsonArrayWriter] = {}
+
+    def __writer(self, name: str) -> JsonArrayWriter:
+        writer = self.__writers.get(name, None)
+        if writer is None:
+            os.makedirs(os.path.dirname(f"{self.output_dir}/{name}"), exist_ok=True)
+            writer = self.__writers[name] = JsonArrayWriter(f"{self.output_dir}/{name}", compact=self.__compact)
+        return writer
+
+    def add(self, entry: dict, encoded: str | None = None):
+        ''' :param encoded: the entry as already encoded by a JsonArrayWriter in the same mode. '''
+        year = str(entry.get('year', ''))
+        author_shard = self.__writer(f"author/{entry['author']}.json")
+        encoded = encoded if encoded is not None else author_shard.encode(entry)
+        author_shard.write(entry, encoded)
+        self.__writer(f"year/{year if YEAR_PATTERN.fullmatch(year) else 'unknown'}.json").write(entry, encoded)
+
+    def close(self):
+        ''' completes every shard, removes shards which no longer have any entries and writes the manifest. '''
+        shards = {}
+        changed = 0
+        for name in sorted(self.__writers.keys()):
+            writer = self.__writers[name]
+            writer.close()
+            changed += 1 if writer.changed else 0
+            shards[name] = {'count': writer.count, 'bytes': writer.offset, 'sha256': writer.sha256}
+        for path in glob.glob(f"{self.output_dir}/*/*.json"):
+            if os.path.relpath(path, self.output_dir).replace(os.sep, '/') not in shards:
+                print(f"Deleting {path}")
+                os.remove(path)
+        os.makedirs(self.output_dir, exist_ok=True)
+        with open(f"{self.output_dir}/manifest.json", 'w', encoding='utf-8') as f:
+            json.dump({'version': VERSION, 'shards': shards}, f, indent=0)
+        print(f"Shards: {len(shards)} in {self.output_dir}, {changed} changed")
+
+    def abort(self):
+        for writer in self.__writers.values():
+            writer.abort()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
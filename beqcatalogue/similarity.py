@@ -0,0 +1,121 @@
+'''
+Finds clusters of near identical BEQs by comparing the filter responses in docs/responses.bin.
+
+Two entries are similar if their responses differ by no more than the threshold (in dB) at every grid point. Each
+response is reduced to the mean level in a few bands, which can differ by no more than the threshold if the full
+responses are similar, so a box query on a KD-tree of those features yields every candidate without comparing all
+pairs. Candidates are then verified against the full response.
+'''
+import argparse
+import array
+import json
+import os
+
+from response import POINTS, SCALE, load_responses
+
+BANDS = 6
+LEAF_SIZE = 16
+
+
+def band_means(response: array.array) -> tuple[float, ...]:
+    size = POINTS // BANDS
+    return tuple(sum(response[i:i + size]) / size for i in range(0, size * BANDS, size))
+
+
+class KDTree:
+    ''' a static KD-tree supporting axis aligned box queries. '''
+
+    def __init__(self, points: list[tuple[float, ...]]):
+        self.points = points
+        self.__dims = len(points[0]) if points else 0
+        self.__root = self.__build(list(range(len(points))), 0) if points else []
+
+    def __build(self, idx: list[int], depth: int):
+        if len(idx) <= LEAF_SIZE:
+            return idx
+        axis = depth % self.__dims
+        idx.sort(key=lambda i: self.points[i][axis])
+        mid = len(idx) // 2
+        return axis, self.points[idx[mid]][axis], self.__build(idx[:mid], depth + 1), self.__build(idx[mid:], depth + 1)
+
+    def query_box(self, lo: tuple[float, ...], hi: tuple[float, ...]) -> list[int]:
+        ''' :return: the index of every point p where lo <= p <= hi in every dimension. '''
+        found = []
+        to_visit = [self.__root]
+        while to_visit:
+            node = to_visit.pop()
+            if isinstance(node, list):
+                for i in node:
+                    p = self.points[i]
+                    if all(l <= v <= h for l, v, h in zip(lo, p, hi)):
+                        found.append(i)
+            else:
+                axis, split, left, right = node
+                if lo[axis] <= split:
+                    to_visit.append(left)
+                if hi[axis] >= split:
+                    to_visit.append(right)
+        return found
+
+
+def find_similar(responses: dict[str, array.array], threshold: float) -> list[list[str]]:
+    '''
+    :param responses: quantised responses by digest.
+    :param threshold: the max difference in dB at any point.
+    :return: each group of digests linked by a similar response, largest first.
+    '''
+    digests = sorted(responses.keys())
+    limit = round(threshold * SCALE)
+    tree = KDTree([band_means(responses[d]) for d in digests])
+    parent = list(range(len(digests)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, d in enumerate(digests):
+        p = tree.points[i]
+        response = responses[d]
+        for j in tree.query_box(tuple(v - limit for v in p), tuple(v + limit for v in p)):
+            if j > i and find(i) != find(j):
+                if max(abs(a - b) for a, b in zip(response, responses[digests[j]])) <= limit:
+                    parent[find(j)] = find(i)
+    clusters = {}
+    for i, d in enumerate(digests):
+        clusters.setdefault(find(i), []).append(d)
+    return sorted([c for c in clusters.values() if len(c) > 1], key=lambda c: (-len(c), c[0]))
+
+
+def max_difference(responses: dict[str, array.array], cluster: list[str]) -> float:
+    return max(max(vals) - min(vals) for vals in zip(*[responses[d] for d in cluster])) / SCALE
+
+
+if __name__ == '__main__':
+    if os.getcwd() == os.path.dirname(os.path.abspath(__file__)):
+        os.chdir('..')
+    arg_parser = argparse.ArgumentParser(description='Reports clusters of BEQs with near identical filter responses')
+    arg_parser.add_argument('--threshold', type=float, default=0.5,
+                            help='max difference in dB at any frequency for two BEQs to be considered similar')
+    arg_parser.add_argument('--same-author', action='store_true',
+                            help='also report clusters which only contain BEQs from a single author')
+    args = arg_parser.parse_args()
+
+    entries_by_digest = {}
+    with open('docs/database.json', 'r', encoding='utf-8') as f:
+        for entry in json.load(f):
+            if entry.get('filters', None):
+                entries_by_digest.setdefault(entry['digest'], []).append(entry)
+    all_responses = load_responses('docs/responses.bin')
+    known = {d: r for d, r in all_responses.items() if d in entries_by_digest}
+    print(f"Indexing {len(known)} responses")
+    reported = 0
+    for c in find_similar(known, args.threshold):
+        members = [e for d in c for e in entries_by_digest[d]]
+        if args.same_author or len({e['author'] for e in members}) > 1:
+            reported += 1
+            print(f"SIMILAR: {len(members)} entries within {max_difference(known, c):.2f} dB")
+            for e in sorted(members, key=lambda e: (e['author'], e['title'])):
+                print(f"    {e['author']}/{e['title']} - {e.get('underlying', '')}")
+    print(f"{reported} clusters found at a threshold of {args.threshold} dB")
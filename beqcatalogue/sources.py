@@ -0,0 +1,97 @@
+'''
+Where extract_from_repo reads each author's files from.
+
+    WorkingTreeSource : the files checked out under the repository directory, found with glob
+    GitObjectSource   : the blobs committed at HEAD, read straight from the object store so the repository can be bare
+                        (or a clone without a checkout). The tree is listed once with git ls-tree, which also supplies
+                        the blob sha of every file, and blobs are streamed from a single git cat-file --batch process.
+
+Both list the same files, i.e. every *.xml file beneath the directory whose path has no hidden component, sorted by path.
+'''
+import glob
+import os
+import subprocess
+from typing import NamedTuple
+
+
+class InputFile(NamedTuple):
+    # path relative to the root of the repository
+    git_path: str
+    # blob sha if known without reading the file
+    sha: str | None
+
+
+class WorkingTreeSource:
+
+    def __init__(self, repo_path: str):
+        self.repo_path = repo_path
+
+    def list_files(self, sub_dir: str) -> list[InputFile]:
+        files = sorted(glob.glob(f"{self.repo_path}{sub_dir}/**/*.xml", recursive=True))
+        return [InputFile(f[len(self.repo_path):], None) for f in files]
+
+    def read(self, f: InputFile) -> bytes | None:
+        ''' :return: None, the file is read from the working tree by whoever parses it. '''
+        return None
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class GitObjectSource:
+
+    def __init__(self, repo_path: str, rev: str = 'HEAD'):
+        self.repo_path = repo_path
+        self.rev = rev
+        self.__cat_file: subprocess.Popen | None = None
+
+    def list_files(self, sub_dir: str) -> list[InputFile]:
+        tree = subprocess.run(['git', '-C', self.repo_path, 'ls-tree', '-r', '-z', '--full-tree', self.rev, '--',
+                               f"{sub_dir}/"], check=True, stdout=subprocess.PIPE).stdout
+        files = []
+        for entry in tree.split(b'\0'):
+            if entry:
+                info, path = entry.split(b'\t', 1)
+                mode, object_type, sha = info.decode('utf-8').split(' ')
+                git_path = os.fsdecode(path)
+                # regular files only, glob would not match hidden files or anything beneath a hidden directory
+                if mode in ('100644', '100755') and git_path.endswith('.xml') \
+                        and not any(p.startswith('.') for p in git_path.split('/')):
+                    files.append(InputFile(git_path, sha))
+        return sorted(files)
+
+    def read(self, f: InputFile) -> bytes:
+        if self.__cat_file is None:
+            self.__cat_file = subprocess.Popen(['git', '-C', self.repo_path, 'cat-file', '--batch'],
+                                               stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self.__cat_file.stdin.write(f"{f.sha}\n".encode('utf-8'))
+        self.__cat_file.stdin.flush()
+        header = self.__cat_file.stdout.readline().decode('utf-8').split()
+        if len(header) != 3:
+            raise ValueError(f"Unable to read {f.git_path} ({f.sha}) from {self.repo_path}: {' '.join(header)}")
+        size = int(header[2])
+        data = self.__cat_file.stdout.read(size + 1)
+        return data[:size]
+
+    def close(self):
+        if self.__cat_file is not None:
+            self.__cat_file.stdin.close()
+            self.__cat_file.wait()
+            self.__cat_file.stdout.close()
+            self.__cat_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def open_source(repo_path: str, git_objects: bool = False) -> WorkingTreeSource | GitObjectSource:
+    return GitObjectSource(repo_path) if git_objects else WorkingTreeSource(repo_path)
@@ -0,0 +1,44 @@
+import pickle
+import tempfile
+from typing import Iterator
+
+
+class TitleGroups:
+    '''
+    Groups the metas extracted for an author by title, in the order each title was first seen. The metas are pickled
+    to a temporary file as they are added so only the offsets are held in memory, each group is read back when it
+    is iterated.
+    '''
+
+    def __init__(self):
+        self.__f = tempfile.TemporaryFile()
+        self.__groups: dict[str, list[tuple[int, int]]] = {}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.__groups
+
+    def __len__(self) -> int:
+        return len(self.__groups)
+
+    def append(self, key: str, meta: dict):
+        data = pickle.dumps(meta, protocol=pickle.HIGHEST_PROTOCOL)
+        offset = self.__f.seek(0, 2)
+        self.__f.write(data)
+        self.__groups.setdefault(key, []).append((offset, len(data)))
+
+    def items(self) -> Iterator[tuple[str, list[dict]]]:
+        for key, refs in self.__groups.items():
+            metas = []
+            for offset, length in refs:
+                self.__f.seek(offset)
+                metas.append(pickle.loads(self.__f.read(length)))
+            yield key, metas
+
+    def close(self):
+        self.__f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
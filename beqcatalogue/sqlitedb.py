@@ -0,0 +1,170 @@
+'''
+Writes the catalogue to a SQLite database as an alternative to parsing database.json.
+
+Each entry is a row in entries, keyed by author and path, i.e. the path of the file the entry was extracted from or,
+for entries which are only retained from the previous build, its catalogue url. A path seen more than once in a run is
+suffixed with #<n> so there is always one row per entry in database.json. The filters, audio types and genres of each
+entry are held in child tables. The full entry is also kept as json so it can be reproduced exactly. The database is
+updated in place, entries which are unchanged since the last run are left alone and entries which are no longer
+generated are removed when the run finishes.
+'''
+import json
+import os
+import sqlite3
+
+SCHEMA_VERSION = 2
+BATCH_SIZE = 1000
+
+SCHEMA = '''
+CREATE TABLE entries (
+    id INTEGER PRIMARY KEY,
+    author TEXT NOT NULL,
+    path TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    underlying TEXT NOT NULL,
+    title TEXT NOT NULL,
+    year TEXT,
+    content_type TEXT,
+    season TEXT,
+    episode TEXT,
+    theMovieDB TEXT,
+    catalogue_url TEXT,
+    created_at INTEGER,
+    updated_at INTEGER,
+    json TEXT NOT NULL,
+    generation INTEGER NOT NULL,
+    UNIQUE (author, path)
+);
+CREATE INDEX entries_digest ON entries (digest);
+CREATE INDEX entries_title ON entries (title COLLATE NOCASE);
+CREATE INDEX entries_author ON entries (author);
+CREATE INDEX entries_tmdb ON entries (theMovieDB);
+CREATE INDEX entries_updated_at ON entries (updated_at);
+CREATE INDEX entries_generation ON entries (generation);
+CREATE TABLE filters (
+    entry_id INTEGER NOT NULL REFERENCES entries (id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    fs INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    freq REAL,
+    gain REAL,
+    q REAL,
+    count INTEGER NOT NULL,
+    b0 TEXT,
+    b1 TEXT,
+    b2 TEXT,
+    -- as stored in the catalogue, i.e. -a1 and -a2 with a0 normalised to 1
+    a1 TEXT,
+    a2 TEXT,
+    PRIMARY KEY (entry_id, idx, fs)
+) WITHOUT ROWID;
+CREATE TABLE audio_types (
+    entry_id INTEGER NOT NULL REFERENCES entries (id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    audio_type TEXT NOT NULL,
+    codec TEXT,
+    channels TEXT,
+    PRIMARY KEY (entry_id, idx)
+) WITHOUT ROWID;
+CREATE INDEX audio_types_audio_type ON audio_types (audio_type);
+CREATE TABLE genres (
+    entry_id INTEGER NOT NULL REFERENCES entries (id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    genre TEXT NOT NULL,
+    PRIMARY KEY (entry_id, idx)
+) WITHOUT ROWID;
+CREATE INDEX genres_genre ON genres (genre);
+'''
+
+ENTRY_COLUMNS = ['author', 'path', 'digest', 'underlying', 'title', 'year', 'content_type', 'season', 'episode',
+                 'theMovieDB', 'catalogue_url', 'created_at', 'updated_at']
+
+
+class SqliteCatalogue:
+
+    def __init__(self, path: str):
+        self.path = path
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.__pending = 0
+        self.__paths: dict[tuple[str, str], int] = {}
+        self.__db = sqlite3.connect(path)
+        self.__db.execute('PRAGMA foreign_keys = ON')
+        if self.__db.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+            self.__db.close()
+            if os.path.exists(path):
+                print(f"Recreating {path} as it was written with a different schema")
+                os.remove(path)
+            self.__db = sqlite3.connect(path)
+            self.__db.execute('PRAGMA foreign_keys = ON')
+            self.__db.executescript(SCHEMA)
+            self.__db.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        self.generation = self.__db.execute('SELECT COALESCE(MAX(generation), 0) + 1 FROM entries').fetchone()[0]
+
+    def add(self, entry: dict, git_path: str = None):
+        '''
+        inserts the entry, or updates it in place if the entry with the same key has changed.
+        :param git_path: the path of the file the entry was extracted from, defaults to the catalogue url.
+        '''
+        text = json.dumps(entry, separators=(',', ':'), sort_keys=True)
+        path = git_path or entry.get('catalogue_url', '')
+        seen = self.__paths.get((entry['author'], path), 0)
+        self.__paths[(entry['author'], path)] = seen + 1
+        if seen:
+            path = f"{path}#{seen + 1}"
+        values = [entry.get(c, None) for c in ENTRY_COLUMNS]
+        values[1] = path
+        values[3] = values[3] or ''
+        row = self.__db.execute('SELECT id, json FROM entries WHERE author = ? AND path = ?',
+                                values[0:2]).fetchone()
+        if row is None:
+            cols = ', '.join(ENTRY_COLUMNS)
+            cur = self.__db.execute(f"INSERT INTO entries ({cols}, json, generation) "
+                                    f"VALUES ({', '.join(['?'] * len(ENTRY_COLUMNS))}, ?, ?)",
+                                    values + [text, self.generation])
+            self.__add_children(cur.lastrowid, entry)
+            self.inserted += 1
+        elif row[1] == text:
+            self.__db.execute('UPDATE entries SET generation = ? WHERE id = ?', (self.generation, row[0]))
+            self.unchanged += 1
+        else:
+            cols = ', '.join(f"{c} = ?" for c in ENTRY_COLUMNS[2:])
+            self.__db.execute(f"UPDATE entries SET {cols}, json = ?, generation = ? WHERE id = ?",
+                              values[2:] + [text, self.generation, row[0]])
+            for table in ('filters', 'audio_types', 'genres'):
+                self.__db.execute(f"DELETE FROM {table} WHERE entry_id = ?", (row[0],))
+            self.__add_children(row[0], entry)
+            self.updated += 1
+        self.__pending += 1
+        if self.__pending >= BATCH_SIZE:
+            self.__db.commit()
+            self.__pending = 0
+
+    def keep(self, author: str):
+        ''' leaves every entry of the author in place as if it had been added in this run. '''
+        self.unchanged += self.__db.execute('UPDATE entries SET generation = ? WHERE author = ?',
+                                            (self.generation, author)).rowcount
+
+    def __add_children(self, entry_id: int, entry: dict):
+        self.__db.executemany('INSERT INTO filters VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', [
+            (entry_id, i, int(fs), f['type'], f.get('freq', None), f.get('gain', None), f.get('q', None),
+             f.get('count', 1), *c['b'], *c['a'])
+            for i, f in enumerate(entry.get('filters', []))
+            for fs, c in f.get('biquads', {}).items()
+        ])
+        audio_types = entry.get('audioTypes', [])
+        codecs = entry.get('audioCodecs', [None] * len(audio_types))
+        channels = entry.get('audioChannelCounts', [None] * len(audio_types))
+        self.__db.executemany('INSERT INTO audio_types VALUES (?, ?, ?, ?, ?)',
+                              [(entry_id, i, *a) for i, a in enumerate(zip(audio_types, codecs, channels))])
+        self.__db.executemany('INSERT INTO genres VALUES (?, ?, ?)',
+                              [(entry_id, i, g) for i, g in enumerate(entry.get('genres', []))])
+
+    def finish(self):
+        ''' removes entries which were not added in this run then commits. '''
+        removed = self.__db.execute('DELETE FROM entries WHERE generation < ?', (self.generation,)).rowcount
+        self.__db.commit()
+        self.__db.close()
+        print(f"SQLite catalogue {self.path}: {self.inserted} inserted, {self.updated} updated, "
+              f"{self.unchanged} unchanged, {removed} removed")
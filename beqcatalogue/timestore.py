@@ -0,0 +1,102 @@
+'''
+The time each author file was created and last updated, by git path.
+
+meta/<author>.times.csv holds a path,created,updated row per file and is append only. Applying meta/<author>.diff then
+saving appends a row for each file whose times have changed, nothing is written if none have. When a path has more than
+one row the last one wins. Once superseded rows make up more than half of the file it is compacted, i.e. rewritten with
+one row per path in the order the paths were first added.
+
+If the build fails for the author the times file is left as it was and the diff is deferred to
+meta/<author>.diff.pending instead, it is applied ahead of the next diff by the next build.
+'''
+import csv
+import os
+
+
+class TimesStore:
+
+    def __init__(self, author: str):
+        self.author = author
+        self.path = f"meta/{author}.times.csv"
+        self.pending_path = f"meta/{author}.diff.pending"
+        self.__times: dict[str, tuple[int, int]] | None = None
+        self.__rows = 0
+        # the diff rows applied, and the paths they changed, which have not been saved yet
+        self.__diff: list[list[str]] = []
+        self.__changed: dict[str, None] = {}
+
+    def __load(self) -> dict[str, tuple[int, int]]:
+        ''' reads the file on first use. '''
+        if self.__times is None:
+            self.__times = {}
+            if os.path.isfile(self.path):
+                with open(self.path, newline='') as f:
+                    for row in csv.reader(f):
+                        self.__times[row[0]] = (int(row[1]), int(row[2]))
+                        self.__rows += 1
+        return self.__times
+
+    def get(self, path: str) -> tuple[int, int] | None:
+        ''' :return: the created and updated times of the file, None if it is unknown. '''
+        return self.__load().get(path, None)
+
+    def __len__(self) -> int:
+        return len(self.__load())
+
+    def apply_diff(self, diff_path: str | None = None) -> int:
+        '''
+        updates the store from any pending diff and then the diff written by inputs.py, a file seen for the first time
+        is created and updated at its commit time, otherwise only its updated time changes. Nothing is written until
+        save or defer is called.
+        :return: the number of files whose times changed.
+        '''
+        diff_path = diff_path if diff_path else f"meta/{self.author}.diff"
+        times = self.__load()
+        for path in (self.pending_path, diff_path):
+            if os.path.isfile(path):
+                with open(path, newline='') as f:
+                    for row in csv.reader(f):
+                        if row:
+                            self.__diff.append(row)
+                            old = times.get(row[0], None)
+                            new = (old[0] if old else int(row[1]), int(row[1]))
+                            if new != old:
+                                times[row[0]] = new
+                                self.__changed[row[0]] = None
+        return len(self.__changed)
+
+    def save(self):
+        ''' writes the changed times and discards the pending diff. '''
+        if self.__changed:
+            if self.__rows + len(self.__changed) > 2 * len(self.__times):
+                self.__compact()
+            else:
+                self.__append(list(self.__changed))
+        if os.path.isfile(self.pending_path):
+            os.remove(self.pending_path)
+        self.__diff = []
+        self.__changed = {}
+
+    def defer(self):
+        ''' leaves the times file untouched and keeps the applied diff for the next build. '''
+        if self.__diff:
+            with open(f"{self.pending_path}.tmp", mode='w', newline='') as f:
+                csv.writer(f).writerows(self.__diff)
+            os.replace(f"{self.pending_path}.tmp", self.pending_path)
+        self.__diff = []
+        self.__changed = {}
+
+    def __append(self, paths: list[str]):
+        with open(self.path, mode='a', newline='') as f:
+            w = csv.writer(f)
+            for p in paths:
+                w.writerow([p, str(self.__times[p][0]), str(self.__times[p][1])])
+        self.__rows += len(paths)
+
+    def __compact(self):
+        with open(f"{self.path}.tmp", mode='w', newline='') as f:
+            w = csv.writer(f)
+            for k, v in self.__times.items():
+                w.writerow([k, str(v[0]), str(v[1])])
+        os.replace(f"{self.path}.tmp", self.path)
+        self.__rows = len(self.__times)